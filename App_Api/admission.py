@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Contrôle d'admission des appels LLM
+Limite le débit (seau à jetons) et la concurrence des générations, borne la
+file d'attente et réessaie les erreurs de limitation des fournisseurs avec un
+délai exponentiel aléatoire
+"""
+
+import os
+import math
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+# Codes d'erreur AWS et classes d'erreur OpenAI signalant une limitation de débit
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+    "ModelNotReadyException",
+}
+THROTTLING_ERROR_CLASSES = {"RateLimitError", "ServiceUnavailableError"}
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """
+    Indique si l'erreur (ou sa cause) est une limitation de débit du fournisseur
+    """
+    while error is not None:
+        code = getattr(error, "response", None)
+        if isinstance(code, dict) and code.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES:
+            return True
+        if type(error).__name__ in THROTTLING_ERROR_CLASSES:
+            return True
+        error = error.__cause__
+    return False
+
+
+class AdmissionRejected(Exception):
+    """
+    Levée lorsque la file d'attente est pleine ou que l'attente est trop longue
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Service saturé, réessayez dans {retry_after} s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Admet les générations dans la limite d'un débit et d'une concurrence.
+    Les demandes en excès attendent dans une file bornée ; au-delà, elles
+    sont rejetées avec un délai de nouvelle tentative estimé.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_wait_seconds: Optional[float] = None,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.max_concurrency = max_concurrency or int(
+            os.environ.get("LLM_ADMISSION_CONCURRENCY", os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+        )
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get("LLM_ADMISSION_QUEUE", "64"))
+        self.max_wait_seconds = max_wait_seconds or float(os.environ.get("LLM_ADMISSION_MAX_WAIT_SECONDS", "30"))
+        # Débit nul : pas de limite de débit, seule la concurrence est bornée
+        self.rate_per_second = rate_per_second if rate_per_second is not None else float(
+            os.environ.get("LLM_ADMISSION_RATE", "0")
+        )
+        self.burst = burst or int(os.environ.get("LLM_ADMISSION_BURST", str(self.max_concurrency)))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("LLM_THROTTLE_RETRIES", "3"))
+        self.retry_base_delay = float(os.environ.get("LLM_THROTTLE_BASE_DELAY_SECONDS", "0.5"))
+        self.retry_max_delay = float(os.environ.get("LLM_THROTTLE_MAX_DELAY_SECONDS", "8"))
+
+        # Créés dans la boucle d'événements au premier appel
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bucket_lock: Optional[asyncio.Lock] = None
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+
+        # Compteurs exposés par stats()
+        self.waiting = 0
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.throttle_retries = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_observed = 0.0
+        self._avg_service_seconds = 1.0
+
+    def _ensure_primitives(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket_lock = asyncio.Lock()
+
+    def _retry_after(self) -> int:
+        """
+        Estime le délai avant qu'une place se libère
+        """
+        backlog = (self.waiting + 1) / self.max_concurrency
+        estimate = backlog * self._avg_service_seconds
+        if self.rate_per_second > 0:
+            estimate = max(estimate, (self.waiting + 1) / self.rate_per_second)
+        return max(1, math.ceil(estimate))
+
+    async def _take_token(self):
+        if self.rate_per_second <= 0:
+            return
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_second)
+                self._refilled_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate_per_second)
+
+    async def _acquire(self):
+        await self._semaphore.acquire()
+        try:
+            await self._take_token()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """
+        Attend une place (concurrence et débit) ou lève AdmissionRejected
+        """
+        self._ensure_primitives()
+        # Rejet immédiat si toutes les places et toute la file sont occupées
+        if self.waiting + self.active >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self._retry_after())
+
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._acquire(), timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AdmissionRejected(self._retry_after())
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.total_wait_seconds += waited
+        self.max_wait_observed = max(self.max_wait_observed, waited)
+
+        self.active += 1
+        service_started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            # Moyenne mobile exponentielle de la durée de service
+            self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * (time.monotonic() - service_started)
+
+    async def retry_throttled(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Exécute func() en réessayant les erreurs de limitation du fournisseur,
+        avec un délai exponentiel plafonné et aléatoire (full jitter)
+        """
+        attempt = 0
+        while True:
+            try:
+                return await func()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_throttling_error(e):
+                    raise
+                delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+                attempt += 1
+                self.throttle_retries += 1
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retourne la profondeur de file, les places occupées et les temps d'attente
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rate_per_second": self.rate_per_second,
+            "queue_depth": self.waiting,
+            "active": self.active,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "throttle_retries": self.throttle_retries,
+            "avg_wait_seconds": round(self.total_wait_seconds / self.admitted, 4) if self.admitted else 0.0,
+            "max_wait_seconds": round(self.max_wait_observed, 4),
+        }
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Banc de mesure de charge pour l'API de génération
+Envoie des requêtes concurrentes sur /generate et /generate-connection et
+mesure le débit, les latences (p50/p95/p99) et le temps jusqu'au premier octet.
+Les résultats sont enregistrés en JSON pour comparer les exécutions.
+
+Utilisation :
+    python fake_llm_server.py --port 9000 &
+    BEDROCK_ENDPOINT_URL=http://127.0.0.1:9000 AWS_ACCESS_KEY_ID=test AWS_SECRET_ACCESS_KEY=test uvicorn main:app --port 8000 &
+    python benchmark.py --concurrency 32 --requests 500 --output bench_avant.json
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+# API URL (adjust if needed)
+API_URL = "http://127.0.0.1:8000"
+
+CONNECTION_SAMPLE = {
+    "user": {
+        "name": "Jean Dupont",
+        "title": "Développeur Full Stack",
+        "experience": "5 ans d'expérience en développement web, spécialisé dans les technologies JavaScript (React, Node.js) et Python (Django, Flask).",
+        "skills": ["JavaScript", "React", "Node.js", "Python", "Django", "Flask", "AWS"],
+        "goals": "Je souhaite développer mon réseau dans le domaine du développement web et de l'IA."
+    },
+    "target": {
+        "name": "Marie Martin",
+        "title": "Lead Developer",
+        "company": "AI Solutions",
+        "background": "Diplômée de l'École Polytechnique, spécialisation en IA",
+        "interests": ["Intelligence Artificielle", "Python", "Machine Learning", "Cloud Computing"]
+    },
+    "common_points": ["Développement Python", "Intérêt pour l'IA", "Technologies cloud"]
+}
+
+
+def _load_letter_sample() -> Dict:
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "user_input.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _payload(endpoint: str, index: int, unique: bool) -> Dict:
+    """
+    Construit le corps d'une requête. Avec unique=True, chaque requête diffère
+    pour ne mesurer ni le cache de réponses ni le regroupement des appels.
+    """
+    if endpoint == "generate":
+        payload = _load_letter_sample()
+        if unique:
+            payload["job"]["title"] += f" #{index}"
+    else:
+        payload = json.loads(json.dumps(CONNECTION_SAMPLE))
+        if unique:
+            payload["target"]["name"] += f" #{index}"
+    payload["no_cache"] = unique
+    return payload
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = int(round(pct / 100 * (len(ordered) - 1)))
+    return round(ordered[index], 4)
+
+
+async def _one_request(client: httpx.AsyncClient, path: str, payload: Dict) -> Dict:
+    """
+    Envoie une requête et mesure le temps jusqu'au premier octet et la durée totale
+    """
+    started = time.perf_counter()
+    ttfb = None
+    try:
+        async with client.stream("POST", path, json=payload) as response:
+            async for _ in response.aiter_raw():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+            status = response.status_code
+    except httpx.HTTPError as e:
+        return {"status": type(e).__name__, "latency": time.perf_counter() - started, "ttfb": None}
+    return {"status": status, "latency": time.perf_counter() - started, "ttfb": ttfb}
+
+
+async def run_scenario(url: str, endpoint: str, stream: bool, concurrency: int, total: int, unique: bool) -> Dict:
+    """
+    Exécute `total` requêtes sur un endpoint avec `concurrency` clients simultanés
+    """
+    path = f"/{endpoint}/stream" if stream else f"/{endpoint}"
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for index in range(total):
+        queue.put_nowait(index)
+    samples: List[Dict] = []
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=300, limits=limits) as client:
+        async def worker():
+            while True:
+                try:
+                    index = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                samples.append(await _one_request(client, path, _payload(endpoint, index, unique)))
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    ok = [s for s in samples if s["status"] == 200]
+    statuses: Dict[str, int] = {}
+    for sample in samples:
+        statuses[str(sample["status"])] = statuses.get(str(sample["status"]), 0) + 1
+    latencies = [s["latency"] for s in ok]
+    ttfbs = [s["ttfb"] for s in ok if s["ttfb"] is not None]
+    return {
+        "path": path,
+        "concurrency": concurrency,
+        "requests": total,
+        "succeeded": len(ok),
+        "statuses": statuses,
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "latency_seconds": {
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else None,
+        },
+        "ttfb_seconds": {
+            "p50": _percentile(ttfbs, 50),
+            "p95": _percentile(ttfbs, 95),
+            "p99": _percentile(ttfbs, 99),
+        },
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+async def main(args):
+    endpoints = ["generate", "generate-connection"] if args.endpoint == "both" else [args.endpoint]
+    async with httpx.AsyncClient(base_url=args.url, timeout=10) as client:
+        stats_before = (await client.get("/stats")).json() if args.collect_stats else None
+
+    results = []
+    for endpoint in endpoints:
+        for concurrency in args.concurrency:
+            print(f"Scénario {endpoint} (stream={args.stream}) : {args.requests} requêtes, concurrence {concurrency}...")
+            result = await run_scenario(args.url, endpoint, args.stream, concurrency, args.requests, not args.allow_cache)
+            print(
+                f"  {result['throughput_rps']} req/s | latence p50={result['latency_seconds']['p50']} "
+                f"p95={result['latency_seconds']['p95']} p99={result['latency_seconds']['p99']} | "
+                f"TTFB p50={result['ttfb_seconds']['p50']} | statuts {result['statuses']}"
+            )
+            results.append(result)
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "git_revision": _git_revision(),
+        "url": args.url,
+        "label": args.label,
+        "scenarios": results,
+    }
+    if args.collect_stats:
+        async with httpx.AsyncClient(base_url=args.url, timeout=10) as client:
+            report["server_stats"] = {"before": stats_before, "after": (await client.get("/stats")).json()}
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nRésultats enregistrés dans '{args.output}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure de charge de l'API de génération")
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--endpoint", choices=["generate", "generate-connection", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Un ou plusieurs niveaux de concurrence")
+    parser.add_argument("--requests", type=int, default=100, help="Nombre de requêtes par scénario")
+    parser.add_argument("--stream", action="store_true", help="Utilise les routes /stream (mesure du TTFB réel)")
+    parser.add_argument("--allow-cache", action="store_true", help="Requêtes identiques, cache et regroupement autorisés")
+    parser.add_argument("--no-stats", dest="collect_stats", action="store_false", help="Ne pas relever GET /stats")
+    parser.add_argument("--label", default=None, help="Libellé de l'exécution (ex: avant, apres)")
+    parser.add_argument("--output", default=f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Génération en masse hors ligne (sans passer par HTTP)
+Lit des demandes GenerateRequest / ConnectionRequest au format JSONL, les
+confie à un service LLM dimensionné pour la concurrence demandée et écrit
+chaque résultat dans un fichier JSONL dès qu'il est prêt. Le fichier de
+sortie sert de point de reprise : après un arrêt, les demandes déjà traitées
+(repérées par leur position dans le fichier d'entrée) sont ignorées.
+
+Chaque ligne d'entrée est un objet JSON avec un champ "id" (à défaut, le
+numéro de ligne) et, optionnellement, "kind" ("letter" ou "connection",
+déduit de la présence de "job" ou "target" sinon). Les autres champs sont
+ceux du corps de /generate ou /generate-connection.
+
+Utilisation :
+    python bulk_generate.py demandes.jsonl resultats.jsonl --concurrency 16
+    python bulk_generate.py demandes.jsonl resultats.jsonl --retry-failed   # reprise
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, TextIO, Tuple
+
+from pydantic import ValidationError
+
+from admission import AdmissionController
+from llm_engine import GenerationEngine
+from main import _configured_providers, llm_service, ConnectionRequest, GenerateRequest, GenerationResult, LLMService
+
+# Nombre maximal de latences conservées pour les percentiles (échantillonnage)
+LATENCY_SAMPLES = 10000
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = int(round(pct / 100 * (len(ordered) - 1)))
+    return round(ordered[index], 4)
+
+
+class LatencyReservoir:
+    """
+    Échantillon uniforme de taille fixe des latences observées (mémoire
+    constante quel que soit le nombre de demandes)
+    """
+
+    def __init__(self, size: int = LATENCY_SAMPLES):
+        self.size = size
+        self.samples: List[float] = []
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            index = random.randrange(self.count)
+            if index < self.size:
+                self.samples[index] = value
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "p50": _percentile(self.samples, 50),
+            "p95": _percentile(self.samples, 95),
+            "p99": _percentile(self.samples, 99),
+            "mean": round(self.total / self.count, 4) if self.count else None,
+            "max": round(self.maximum, 4) if self.count else None,
+        }
+
+
+class Checkpoint:
+    """
+    Point de reprise en mémoire constante : toutes les demandes jusqu'à la
+    position `offset` du fichier d'entrée sont traitées ; au-delà, seules les
+    demandes terminées en avance (générations simultanées, en nombre borné
+    par la concurrence) sont conservées, ainsi que les demandes en erreur à
+    tenter à nouveau.
+    """
+
+    def __init__(self, retry_failed: bool = False):
+        self.retry_failed = retry_failed
+        self.offset = 0
+        self.ahead: Set[int] = set()
+        self.retry: Set[int] = set()
+        self.records = 0
+
+    def mark(self, position: int, failed: bool = False):
+        self.records += 1
+        if self.retry_failed and failed:
+            self.retry.add(position)
+        else:
+            self.retry.discard(position)
+        if position <= self.offset:
+            return
+        self.ahead.add(position)
+        while self.offset + 1 in self.ahead:
+            self.offset += 1
+            self.ahead.remove(self.offset)
+
+    def is_done(self, position: int) -> bool:
+        return position not in self.retry and (position <= self.offset or position in self.ahead)
+
+
+def load_checkpoint(output_path: str, retry_failed: bool) -> Checkpoint:
+    """
+    Demandes déjà traitées d'après le fichier de sortie. Avec retry_failed,
+    les demandes en erreur sont à nouveau tentées. Une dernière ligne tronquée
+    (arrêt brutal) est ignorée.
+    """
+    checkpoint = Checkpoint(retry_failed)
+    if not os.path.exists(output_path):
+        return checkpoint
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "position" in record:
+                checkpoint.mark(record["position"], failed=bool(record.get("error")))
+    return checkpoint
+
+
+async def read_requests(input_path: str) -> AsyncIterator[Tuple[int, str, str, Dict[str, Any]]]:
+    """
+    Parcourt le fichier d'entrée ligne par ligne et produit (position, id,
+    kind, corps) ; la position compte les lignes non vides à partir de 1
+    """
+    position = 0
+    with open(input_path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            position += 1
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield position, str(number), "invalid", {"error": f"JSON invalide: {e}"}
+                continue
+            record_id = str(record.pop("id", number))
+            kind = record.pop("kind", None) or ("connection" if "target" in record else "letter")
+            yield position, record_id, kind, record
+
+
+def create_bulk_service(concurrency: int) -> LLMService:
+    """
+    Service LLM dédié à une exécution hors ligne : le moteur et le contrôle
+    d'admission acceptent `concurrency` appels simultanés, sans file d'attente
+    bornée dans le temps (les workers attendent leur tour), et partagent les
+    caches du service de l'API
+    """
+    return LLMService(
+        provider=_configured_providers[0],
+        fallback_providers=_configured_providers[1:],
+        engine=GenerationEngine(max_concurrency=concurrency),
+        cache=llm_service.cache,
+        semantic_cache=llm_service.semantic_cache,
+        digests=llm_service.digests,
+        token_budget=llm_service.token_budget,
+        # Jusqu'à 5 versions (variants) générées en parallèle par demande
+        admission=AdmissionController(max_concurrency=concurrency, max_queue=concurrency * 5, max_wait_seconds=24 * 3600)
+    )
+
+
+async def generate_one(service: LLMService, kind: str, body: Dict[str, Any]) -> Tuple[str, GenerationResult]:
+    """
+    Valide la demande comme le ferait l'API puis appelle le service LLM.
+    Retourne le champ de sortie ("letter" ou "message") et le résultat.
+    """
+    if kind == "connection":
+        request = ConnectionRequest(**body)
+        result = await service.generate_connection_message(
+            user=request.user,
+            target=request.target,
+            common_points=request.common_points,
+            use_cache=not request.no_cache,
+            profile=request.profile,
+            variants=request.variants
+        )
+        return "message", result
+    if kind == "letter":
+        request = GenerateRequest(**body)
+        result = await service.generate_letter(
+            request.user,
+            request.job,
+            use_cache=not request.no_cache,
+            profile=request.profile
+        )
+        return "letter", result
+    raise ValueError(body.get("error") or f"Type de demande inconnu: {kind}")
+
+
+class BulkRunner:
+    """
+    Exécute les demandes avec `concurrency` workers. La file d'attente est
+    bornée : le fichier d'entrée n'est lu qu'au rythme des générations.
+    """
+
+    def __init__(self, service: LLMService, output: TextIO, concurrency: int, checkpoint: Checkpoint, progress_every: int = 100):
+        self.service = service
+        self.output = output
+        self.concurrency = concurrency
+        self.checkpoint = checkpoint
+        self.progress_every = progress_every
+        self.latencies = LatencyReservoir()
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+
+    async def run(self, requests: AsyncIterator[Tuple[int, str, str, Dict[str, Any]]]) -> float:
+        queue: "asyncio.Queue[Optional[Tuple[int, str, str, Dict[str, Any]]]]" = asyncio.Queue(maxsize=self.concurrency * 2)
+        started = time.perf_counter()
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        try:
+            async for position, record_id, kind, body in requests:
+                if self.checkpoint.is_done(position):
+                    self.skipped += 1
+                    continue
+                await queue.put((position, record_id, kind, body))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+        return time.perf_counter() - started
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            position, record_id, kind, body = item
+            record: Dict[str, Any] = {"id": record_id, "position": position, "kind": kind}
+            started = time.perf_counter()
+            try:
+                field, result = await generate_one(self.service, kind, body)
+                record[field] = result.text
+                if result.variants:
+                    record["variants"] = result.variants
+                record["metadata"] = result.metadata.model_dump() if result.metadata else None
+                record["error"] = None
+                self.succeeded += 1
+            except ValidationError as e:
+                record["error"] = f"Demande invalide: {e.errors(include_url=False)}"
+                self.failed += 1
+            except Exception as e:
+                record["error"] = str(getattr(e, "detail", e))
+                self.failed += 1
+            latency = time.perf_counter() - started
+            record["latency_seconds"] = round(latency, 4)
+            if record["error"] is None:
+                self.latencies.add(latency)
+            self._write(record)
+
+    def _write(self, record: Dict[str, Any]):
+        # Une ligne complète par résultat, vidée aussitôt : le fichier reste un point de reprise valide
+        self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.output.flush()
+        processed = self.succeeded + self.failed
+        if self.progress_every and processed % self.progress_every == 0:
+            print(f"  {processed} demandes traitées ({self.failed} en erreur)", file=sys.stderr)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        processed = self.succeeded + self.failed
+        return {
+            "processed": processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "concurrency": self.concurrency,
+            "duration_seconds": round(elapsed, 3),
+            "throughput_per_second": round(processed / elapsed, 3) if elapsed else 0.0,
+            "latency_seconds": self.latencies.summary(),
+            "tokens": dict(self.service.token_usage),
+            "tiers": self.service.tier_usage,
+            "cache": self.service.cache.stats(),
+        }
+
+
+def _open_output(output_path: str) -> TextIO:
+    """
+    Ouvre le fichier de sortie en ajout, en terminant une éventuelle ligne tronquée
+    """
+    needs_newline = False
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    output = open(output_path, "a", encoding="utf-8")
+    if needs_newline:
+        output.write("\n")
+    return output
+
+
+async def main(args) -> Dict[str, Any]:
+    checkpoint = load_checkpoint(args.output, args.retry_failed)
+    if checkpoint.records:
+        print(f"Reprise : {checkpoint.records} résultats déjà enregistrés, les demandes traitées seront ignorées", file=sys.stderr)
+
+    service = create_bulk_service(args.concurrency)
+    output = _open_output(args.output)
+    runner = BulkRunner(service, output, args.concurrency, checkpoint, args.progress_every)
+    try:
+        elapsed = await runner.run(read_requests(args.input))
+    finally:
+        output.close()
+        service.engine.shutdown()
+        llm_service.engine.shutdown()
+        llm_service.cache.close()
+        llm_service.digests.close()
+    return runner.report(elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génération en masse de lettres et de messages à partir d'un fichier JSONL")
+    parser.add_argument("input", help="Fichier JSONL des demandes")
+    parser.add_argument("output", help="Fichier JSONL des résultats (sert aussi de point de reprise)")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("LLM_BULK_CONCURRENCY", "8")), help="Nombre de générations simultanées")
+    parser.add_argument("--retry-failed", action="store_true", help="Tente à nouveau les demandes en erreur lors d'une reprise")
+    parser.add_argument("--progress-every", type=int, default=100, help="Affiche l'avancement toutes les N demandes (0 : jamais)")
+    parser.add_argument("--report", default=None, help="Enregistre le rapport final en JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    print(
+        f"\n{report['processed']} demandes traitées en {report['duration_seconds']} s "
+        f"({report['throughput_per_second']}/s), {report['failed']} en erreur, {report['skipped']} ignorées | "
+        f"latence p50={report['latency_seconds']['p50']} p95={report['latency_seconds']['p95']} "
+        f"p99={report['latency_seconds']['p99']} max={report['latency_seconds']['max']}"
+    )
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Rapport enregistré dans '{args.report}'")
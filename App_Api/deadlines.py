@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Échéances des requêtes et abandon du travail inutile
+Chaque requête peut porter une échéance (en-tête X-Request-Timeout ou champ
+timeout_seconds) transmise jusqu'aux appels aux fournisseurs. Lorsque le client
+se déconnecte, le traitement de sa requête est annulé, flux amont compris.
+Le travail abandonné est compté pour mesurer les appels économisés.
+"""
+
+import os
+import time
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Dict, Optional
+
+# Échéance (horloge monotone) de la requête en cours, None sans limite
+current_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("current_deadline", default=None)
+
+DEADLINE_HEADER = b"x-request-timeout"
+
+
+class DeadlineExceeded(Exception):
+    """
+    Levée lorsque l'échéance de la requête est dépassée
+    """
+
+    def __init__(self, message: str = "Échéance de la requête dépassée"):
+        super().__init__(message)
+
+
+class AbandonedWork:
+    """
+    Compteurs du travail abandonné : requêtes annulées par une déconnexion,
+    échéances dépassées, appels aux fournisseurs évités car déjà hors délai
+    """
+
+    def __init__(self):
+        self.disconnects = 0
+        self.deadline_exceeded = 0
+        self.calls_skipped = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "client_disconnects": self.disconnects,
+            "deadline_exceeded": self.deadline_exceeded,
+            "provider_calls_skipped": self.calls_skipped,
+        }
+
+
+abandoned = AbandonedWork()
+
+
+def set_deadline(seconds: Optional[float]):
+    """
+    Applique un délai à la requête en cours ; l'échéance la plus proche l'emporte
+    """
+    if not seconds:
+        return
+    deadline = time.monotonic() + seconds
+    existing = current_deadline.get()
+    if existing is None or deadline < existing:
+        current_deadline.set(deadline)
+
+
+def remaining_seconds() -> Optional[float]:
+    """
+    Temps restant avant l'échéance de la requête en cours (None sans limite)
+    """
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline():
+    """
+    Lève DeadlineExceeded si l'échéance est déjà passée, avant de lancer un
+    appel au fournisseur dont personne n'attendrait la réponse
+    """
+    remaining = remaining_seconds()
+    if remaining is not None and remaining <= 0:
+        abandoned.calls_skipped += 1
+        raise DeadlineExceeded()
+
+
+async def within_deadline(awaitable: Awaitable[Any]) -> Any:
+    """
+    Attend awaitable au plus jusqu'à l'échéance de la requête en cours ;
+    au-delà, l'attente est annulée et DeadlineExceeded est levée
+    """
+    remaining = remaining_seconds()
+    if remaining is None:
+        return await awaitable
+    if remaining <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        abandoned.deadline_exceeded += 1
+        raise DeadlineExceeded()
+    try:
+        return await asyncio.wait_for(awaitable, timeout=remaining)
+    except asyncio.TimeoutError:
+        abandoned.deadline_exceeded += 1
+        raise DeadlineExceeded() from None
+
+
+def _header_timeout(scope) -> Optional[float]:
+    for name, value in scope.get("headers", []):
+        if name == DEADLINE_HEADER:
+            try:
+                seconds = float(value.decode("latin-1"))
+            except ValueError:
+                return None
+            return seconds if seconds > 0 else None
+    return None
+
+
+class CancelOnDisconnectMiddleware:
+    """
+    Middleware ASGI : fixe l'échéance de la requête (en-tête X-Request-Timeout
+    ou LLM_REQUEST_TIMEOUT_SECONDS) et annule son traitement si le client se
+    déconnecte avant la réponse. Une fois le corps reçu, ce middleware seul
+    écoute la connexion et signale la déconnexion à l'application.
+    """
+
+    def __init__(self, app, default_timeout: Optional[float] = None):
+        self.app = app
+        timeout_env = os.environ.get("LLM_REQUEST_TIMEOUT_SECONDS")
+        self.default_timeout = default_timeout if default_timeout is not None else (float(timeout_env) if timeout_env else None)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_deadline.set(None)
+        set_deadline(_header_timeout(scope) or self.default_timeout)
+        body_received = asyncio.Event()
+        disconnected = asyncio.Event()
+
+        async def receive_until_disconnect():
+            if body_received.is_set():
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body", False):
+                body_received.set()
+            return message
+
+        async def watch():
+            await body_received.wait()
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        # La tâche hérite du contexte courant (échéance comprise)
+        app_task = asyncio.ensure_future(self.app(scope, receive_until_disconnect, send))
+        watcher = asyncio.ensure_future(watch())
+        disconnect_wait = asyncio.ensure_future(disconnected.wait())
+        try:
+            await asyncio.wait({app_task, disconnect_wait}, return_when=asyncio.FIRST_COMPLETED)
+            if not app_task.done():
+                # Client parti : la réponse ne serait pas lue
+                abandoned.disconnects += 1
+                app_task.cancel()
+                try:
+                    await app_task
+                except asyncio.CancelledError:
+                    pass
+                return
+            app_task.result()
+        finally:
+            for task in (app_task, watcher, disconnect_wait):
+                if not task.done():
+                    task.cancel()
+            current_deadline.reset(token)
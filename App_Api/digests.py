@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Résumés réutilisables des profils et des offres
+Condense l'expérience du candidat et la description du poste (phrases
+dédoublonnées, budget de jetons, phrases les plus pertinentes au regard des
+compétences et des exigences), une seule fois par version du contenu, pour
+réduire les jetons d'entrée des prompts
+"""
+
+import os
+import re
+import json
+import math
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from response_cache import ResponseCache
+
+# Incrémenté quand la méthode de résumé change (les anciens résumés sont ignorés)
+DIGEST_VERSION = 2
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimation du nombre de jetons d'un texte (environ 4 caractères par jeton)
+    """
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Découpe un texte en phrases ou en lignes de liste (puces, retours à la ligne)
+    """
+    parts = re.split(r"(?<=[.!?;])\s+|\s*\n+\s*|\s+[•▪●·]\s+", text)
+    return [part.strip(" \t-–•▪●·*") for part in parts if part.strip(" \t-–•▪●·*")]
+
+
+def _normalized(text: str) -> str:
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def dedupe(items: List[str]) -> List[str]:
+    """
+    Supprime les doublons (casse et ponctuation ignorées) en gardant l'ordre
+    """
+    seen = set()
+    unique = []
+    for item in items:
+        key = _normalized(item)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(item.strip())
+    return unique
+
+
+# Passages génériques des offres, rarement utiles à la lettre
+BOILERPLATE_PATTERN = re.compile(
+    r"\b(avantages?|mutuelle|tickets? restaurants?|titres? restaurants?|rtt|prévoyance|"
+    r"télétravail|remote|salaire|rémunération|package|primes?|cse|"
+    r"égalité des chances|handicap|diversité|discrimination|rgpd|données personnelles|"
+    r"benefits?|perks|equal opportunity|privacy|health insurance|salary)\b",
+    re.IGNORECASE
+)
+
+# Mots trop courants pour signaler la pertinence d'une phrase
+STOP_WORDS = {
+    "and", "the", "for", "with", "des", "les", "une", "dans", "pour", "par", "sur",
+    "avec", "aux", "est", "sont", "vous", "nous", "votre", "notre", "leur", "plus",
+}
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"\w[\w+#.]*\w|\w", text.lower())
+
+
+def keyword_terms(keywords: Iterable[str]) -> Set[str]:
+    """
+    Termes de pertinence tirés des compétences et exigences (mots significatifs)
+    """
+    terms = set()
+    for keyword in keywords:
+        for word in _words(keyword):
+            if (len(word) > 2 or word in ("c", "r", "go", "ai", "ia", "ml")) and word not in STOP_WORDS:
+                terms.add(word)
+    return terms
+
+
+def score_sentence(sentence: str, terms: Set[str], position: int) -> float:
+    """
+    Pertinence d'une phrase : termes recherchés rapportés à sa longueur,
+    légère priorité aux premières phrases, pénalité pour les passages génériques
+    """
+    words = _words(sentence)
+    if not words:
+        return 0.0
+    matches = len(terms.intersection(words))
+    score = matches / math.sqrt(len(words))
+    if position < 2:
+        score += 0.3
+    if BOILERPLATE_PATTERN.search(sentence):
+        score -= 1.0
+    return score
+
+
+def select_relevant(text: str, keywords: Iterable[str], max_tokens: int) -> str:
+    """
+    Garde les phrases les plus pertinentes du texte dans la limite de
+    max_tokens, en conservant leur ordre d'origine. Les passages génériques
+    sans rapport avec les termes recherchés sont écartés.
+    """
+    sentences = dedupe(split_sentences(text))
+    terms = keyword_terms(keywords)
+    scores = [score_sentence(sentence, terms, index) for index, sentence in enumerate(sentences)]
+    ranked = sorted(range(len(sentences)), key=lambda index: scores[index], reverse=True)
+    kept: List[int] = []
+    used = 0
+    for index in ranked:
+        if scores[index] < 0 and kept:
+            break
+        tokens = estimate_tokens(sentences[index]) + 1
+        if used + tokens <= max_tokens:
+            kept.append(index)
+            used += tokens
+    if not kept and sentences:
+        # Aucune phrase ne tient : la plus pertinente est coupée au dernier mot entier
+        return sentences[ranked[0]][:max_tokens * 4].rsplit(" ", 1)[0] + "…"
+    return " ".join(sentences[index] for index in sorted(kept))
+
+
+def condense(text: str, max_tokens: int, keywords: Optional[Iterable[str]] = None) -> str:
+    """
+    Réduit un texte à ses phrases uniques, dans la limite de max_tokens. Un
+    texte déjà court est seulement dédoublonné ; au-delà, avec keywords, les
+    phrases les plus pertinentes sont retenues, sinon les premières.
+    """
+    sentences = dedupe(split_sentences(text))
+    if keywords is not None and sum(estimate_tokens(sentence) + 1 for sentence in sentences) > max_tokens:
+        return select_relevant(text, keywords, max_tokens)
+    kept: List[str] = []
+    used = 0
+    for sentence in sentences:
+        tokens = estimate_tokens(sentence) + 1
+        if used + tokens > max_tokens:
+            if not kept:
+                # Première phrase trop longue : coupée au dernier mot entier
+                kept.append(sentence[:max_tokens * 4].rsplit(" ", 1)[0] + "…")
+            continue
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept)
+
+
+class DigestStore:
+    """
+    Calcule et conserve les résumés des profils et des offres. La clé est
+    l'empreinte du contenu et des budgets : une nouvelle version du profil ou
+    de l'offre donne un nouveau résumé, une version déjà vue est réutilisée.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        experience_tokens: Optional[int] = None,
+        description_tokens: Optional[int] = None,
+        max_items: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.enabled = enabled if enabled is not None else os.environ.get("LLM_DIGESTS", "1") != "0"
+        self.experience_tokens = experience_tokens or int(os.environ.get("LLM_DIGEST_EXPERIENCE_TOKENS", "250"))
+        self.description_tokens = description_tokens or int(os.environ.get("LLM_DIGEST_DESCRIPTION_TOKENS", "400"))
+        self.max_items = max_items or int(os.environ.get("LLM_DIGEST_MAX_ITEMS", "25"))
+        self.cache = cache or ResponseCache(
+            max_entries=int(os.environ.get("LLM_DIGEST_MAX_ENTRIES", "2048")),
+            ttl_seconds=float(os.environ.get("LLM_DIGEST_TTL_SECONDS", str(7 * 24 * 3600))),
+            # Base propre aux résumés : jamais celle du cache des réponses (LLM_CACHE_DB_PATH)
+            db_path=os.environ.get("LLM_DIGEST_DB_PATH", ""),
+        )
+        self._lock = threading.Lock()
+
+        # Compteurs exposés par stats()
+        self.computed = 0
+        self.reused = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def user(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Résumé d'un profil candidat : expérience condensée, compétences dédoublonnées
+        """
+        return self._digest("user", fields, lambda: dict(
+            fields,
+            experience=condense(fields["experience"], self.experience_tokens, fields["skills"]),
+            skills=dedupe(fields["skills"])[:self.max_items],
+        ))
+
+    def job(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Résumé d'une offre : description condensée, exigences dédoublonnées
+        """
+        return self._digest("job", fields, lambda: dict(
+            fields,
+            description=condense(fields["description"], self.description_tokens, fields["requirements"]),
+            requirements=dedupe(fields["requirements"])[:self.max_items],
+        ))
+
+    def _digest(self, kind: str, fields: Dict[str, Any], compute) -> Dict[str, Any]:
+        if not self.enabled:
+            return fields
+        payload = json.dumps(
+            {"kind": kind, "version": DIGEST_VERSION, "fields": fields, "budgets": [self.experience_tokens, self.description_tokens, self.max_items]},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            digest = json.loads(cached)
+        else:
+            digest = compute()
+            self.cache.set(key, json.dumps(digest, ensure_ascii=False))
+
+        tokens_before = estimate_tokens(json.dumps(fields, ensure_ascii=False))
+        tokens_after = estimate_tokens(json.dumps(digest, ensure_ascii=False))
+        # Les prompts sont construits dans des threads : compteurs mis à jour sous verrou
+        with self._lock:
+            if cached is not None:
+                self.reused += 1
+            else:
+                self.computed += 1
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+        return digest
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retourne les résumés calculés et réutilisés, et les jetons d'entrée
+        économisés (estimation cumulée sur toutes les utilisations)
+        """
+        return {
+            "enabled": self.enabled,
+            "entries": self.cache.stats()["entries"],
+            "computed": self.computed,
+            "reused": self.reused,
+            "estimated_tokens_before": self.tokens_before,
+            "estimated_tokens_after": self.tokens_after,
+            "estimated_tokens_saved": self.tokens_before - self.tokens_after,
+        }
+
+    def close(self):
+        self.cache.close()
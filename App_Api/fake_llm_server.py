@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Serveur local simulant AWS Bedrock Runtime et l'API OpenAI
+Permet de mesurer les performances de l'API sans appeler les vrais fournisseurs.
+La latence, le débit de jetons et le taux d'erreur sont configurables.
+
+Utilisation :
+    python fake_llm_server.py --port 9000 --latency-ms 300 --tokens-per-second 80 --error-rate 0.02
+
+Puis lancer l'API avec :
+    BEDROCK_ENDPOINT_URL=http://127.0.0.1:9000 AWS_ACCESS_KEY_ID=test AWS_SECRET_ACCESS_KEY=test uvicorn main:app
+    (ou OPENAI_API_BASE=http://127.0.0.1:9000/v1 OPENAI_API_KEY=test LLM_PROVIDERS=openai)
+"""
+
+import json
+import time
+import zlib
+import base64
+import random
+import struct
+import asyncio
+import argparse
+from typing import AsyncIterator, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Fournisseur LLM simulé")
+
+# Configuration modifiable par la ligne de commande
+config = {
+    "latency_ms": 300.0,  # Délai avant le premier jeton
+    "tokens_per_second": 80.0,  # Débit de génération
+    "output_tokens": 250,  # Nombre de jetons générés (borné par max_tokens)
+    "error_rate": 0.0,  # Proportion de requêtes rejetées pour limitation de débit
+}
+
+WORDS = (
+    "Madame Monsieur je souhaite vous proposer ma candidature pour ce poste qui correspond "
+    "pleinement à mon expérience et à mes compétences en développement logiciel"
+).split()
+
+
+def _tokens(max_tokens: int) -> List[str]:
+    count = min(int(config["output_tokens"]), max_tokens)
+    return [WORDS[i % len(WORDS)] + " " for i in range(count)]
+
+
+def _should_fail() -> bool:
+    return random.random() < config["error_rate"]
+
+
+async def _paced(tokens: List[str]) -> AsyncIterator[str]:
+    """
+    Produit les jetons au débit configuré, après la latence initiale
+    """
+    await asyncio.sleep(config["latency_ms"] / 1000)
+    interval = 1 / config["tokens_per_second"] if config["tokens_per_second"] > 0 else 0
+    for token in tokens:
+        if interval:
+            await asyncio.sleep(interval)
+        yield token
+
+
+def _usage(body: Dict, output_tokens: int) -> Dict:
+    return {"input_tokens": len(json.dumps(body)) // 4, "output_tokens": output_tokens}
+
+
+# Encodage binaire application/vnd.amazon.eventstream utilisé par Bedrock en flux
+def _eventstream_message(headers: Dict[str, str], payload: bytes) -> bytes:
+    encoded_headers = b""
+    for name, value in headers.items():
+        name_bytes, value_bytes = name.encode(), value.encode()
+        encoded_headers += struct.pack("!B", len(name_bytes)) + name_bytes
+        encoded_headers += struct.pack("!BH", 7, len(value_bytes)) + value_bytes
+    total_length = 12 + len(encoded_headers) + len(payload) + 4
+    prelude = struct.pack("!II", total_length, len(encoded_headers))
+    prelude += struct.pack("!I", zlib.crc32(prelude) & 0xFFFFFFFF)
+    message = prelude + encoded_headers + payload
+    return message + struct.pack("!I", zlib.crc32(message) & 0xFFFFFFFF)
+
+
+def _bedrock_chunk(event: Dict) -> bytes:
+    payload = json.dumps({"bytes": base64.b64encode(json.dumps(event).encode()).decode()}).encode()
+    return _eventstream_message(
+        {":event-type": "chunk", ":content-type": "application/json", ":message-type": "event"},
+        payload
+    )
+
+
+def _bedrock_throttling() -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"message": "Too many requests, please wait before trying again."},
+        headers={"x-amzn-ErrorType": "ThrottlingException"}
+    )
+
+
+@app.post("/model/{model_id}/invoke")
+async def bedrock_invoke(model_id: str, request: Request):
+    """
+    Simule InvokeModel (format Claude 3 Messages)
+    """
+    body = json.loads(await request.body())
+    if _should_fail():
+        return _bedrock_throttling()
+    tokens = _tokens(body.get("max_tokens", 1500))
+    text = "".join([token async for token in _paced(tokens)])
+    return {
+        "id": "msg_fake",
+        "type": "message",
+        "role": "assistant",
+        "model": model_id,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "usage": _usage(body, len(tokens)),
+    }
+
+
+@app.post("/model/{model_id}/invoke-with-response-stream")
+async def bedrock_invoke_stream(model_id: str, request: Request):
+    """
+    Simule InvokeModelWithResponseStream (événements Claude 3 Messages)
+    """
+    body = json.loads(await request.body())
+    if _should_fail():
+        return _bedrock_throttling()
+    tokens = _tokens(body.get("max_tokens", 1500))
+
+    async def events():
+        usage = _usage(body, 0)
+        yield _bedrock_chunk({"type": "message_start", "message": {"usage": usage}})
+        yield _bedrock_chunk({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        async for token in _paced(tokens):
+            yield _bedrock_chunk({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}})
+        yield _bedrock_chunk({"type": "content_block_stop", "index": 0})
+        yield _bedrock_chunk({"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": len(tokens)}})
+        yield _bedrock_chunk({"type": "message_stop"})
+
+    return StreamingResponse(events(), media_type="application/vnd.amazon.eventstream")
+
+
+@app.post("/v1/chat/completions")
+async def openai_chat_completions(request: Request):
+    """
+    Simule l'API Chat Completions d'OpenAI, avec ou sans flux
+    """
+    body = await request.json()
+    if _should_fail():
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+        )
+    tokens = _tokens(body.get("max_tokens", 1500))
+    created = int(time.time())
+
+    if body.get("stream"):
+        async def events():
+            async for token in _paced(tokens):
+                chunk = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    text = "".join([token async for token in _paced(tokens)])
+    usage = _usage(body, len(tokens))
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": created,
+        "model": body.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": usage["input_tokens"],
+            "completion_tokens": usage["output_tokens"],
+            "total_tokens": usage["input_tokens"] + usage["output_tokens"],
+        },
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serveur simulant AWS Bedrock Runtime et OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"], help="Délai avant le premier jeton")
+    parser.add_argument("--tokens-per-second", type=float, default=config["tokens_per_second"], help="Débit de génération (0 = instantané)")
+    parser.add_argument("--output-tokens", type=int, default=config["output_tokens"], help="Jetons générés par réponse")
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"], help="Proportion de réponses 429")
+    args = parser.parse_args()
+
+    config.update(
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        error_rate=args.error_rate,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
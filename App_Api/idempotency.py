@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Clés d'idempotence des requêtes coûteuses
+Une requête rejouée avec le même en-tête Idempotency-Key reçoit la réponse
+enregistrée (ou attend celle encore en cours) au lieu de relancer la
+génération. Les réponses sont conservées dans un stockage (mémoire ou MongoDB)
+pendant une durée limitée.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# États d'une clé
+KEY_IN_PROGRESS = "in_progress"
+KEY_COMPLETED = "completed"
+
+
+class IdempotencyConflict(Exception):
+    """
+    Levée lorsqu'une clé déjà utilisée est présentée avec une autre requête
+    """
+
+
+class IdempotencyInProgress(Exception):
+    """
+    Levée lorsque la requête d'origine est toujours en cours sur une autre
+    instance au-delà du délai d'attente
+    """
+
+
+def fingerprint(payload: Any) -> str:
+    """
+    Empreinte du corps de la requête, pour détecter la réutilisation d'une
+    clé avec une requête différente
+    """
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class LocalIdempotencyStore:
+    """
+    Clés conservées en mémoire (une seule instance de l'API)
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def claim(self, key: str, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Réserve la clé (retourne None) ou retourne l'enregistrement existant
+        """
+        now = time.time()
+        with self._lock:
+            existing = self._records.get(key)
+            if existing is not None and existing["expires_at"] > now:
+                return dict(existing)
+            self._records[key] = record
+            self._records.move_to_end(key)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+            return None
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._records.get(key)
+            if record is None or record["expires_at"] <= time.time():
+                return None
+            return dict(record)
+
+    async def save(self, key: str, record: Dict[str, Any]):
+        with self._lock:
+            self._records[key] = record
+
+    async def release(self, key: str):
+        with self._lock:
+            self._records.pop(key, None)
+
+    async def close(self):
+        pass
+
+
+class MongoIdempotencyStore:
+    """
+    Clés conservées dans MongoDB (motor), partagées entre instances. Un index
+    TTL supprime les clés expirées.
+    """
+
+    def __init__(self, uri: str, db_name: str, collection: str = "llm_idempotency_keys"):
+        # Import différé : motor n'est requis que si MongoDB est configuré
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self._client = AsyncIOMotorClient(uri)
+        self._collection = self._client[db_name][collection]
+        self._indexed = False
+
+    async def _ensure_index(self):
+        if not self._indexed:
+            await self._collection.create_index("expires_at_date", expireAfterSeconds=0)
+            self._indexed = True
+
+    async def claim(self, key: str, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        from pymongo.errors import DuplicateKeyError
+
+        await self._ensure_index()
+        try:
+            await self._collection.insert_one(self._document(key, record))
+            return None
+        except DuplicateKeyError:
+            existing = await self.get(key)
+            if existing is not None:
+                return existing
+            # Clé expirée mais pas encore purgée par l'index TTL : reprise
+            await self._collection.replace_one({"_id": key}, self._document(key, record), upsert=True)
+            return None
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        document = await self._collection.find_one({"_id": key}, {"_id": 0, "expires_at_date": 0})
+        if document is None or document["expires_at"] <= time.time():
+            return None
+        return document
+
+    async def save(self, key: str, record: Dict[str, Any]):
+        await self._collection.replace_one({"_id": key}, self._document(key, record), upsert=True)
+
+    async def release(self, key: str):
+        await self._collection.delete_one({"_id": key})
+
+    async def close(self):
+        self._client.close()
+
+    @staticmethod
+    def _document(key: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        from datetime import datetime, timezone
+
+        return dict(record, _id=key, expires_at_date=datetime.fromtimestamp(record["expires_at"], tz=timezone.utc))
+
+
+def create_idempotency_store():
+    """
+    Choisit le stockage des clés : MongoDB si LLM_IDEMPOTENCY_MONGODB_URI est
+    défini, sinon la mémoire de l'instance
+    """
+    mongodb_uri = os.environ.get("LLM_IDEMPOTENCY_MONGODB_URI")
+    if mongodb_uri:
+        return MongoIdempotencyStore(mongodb_uri, os.environ.get("LLM_IDEMPOTENCY_MONGODB_DB", "hackathon_aws"))
+    return LocalIdempotencyStore(max_entries=int(os.environ.get("LLM_IDEMPOTENCY_MAX_ENTRIES", "10000")))
+
+
+class IdempotencyManager:
+    """
+    Exécute une seule fois le traitement associé à une clé. Les répétitions
+    reçoivent la réponse enregistrée ; pendant l'exécution, elles attendent le
+    même traitement (dans cette instance) ou interrogent le stockage (autre
+    instance). Un traitement en échec libère la clé pour une nouvelle tentative.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        ttl_seconds: Optional[float] = None,
+        in_progress_ttl_seconds: Optional[float] = None,
+        wait_seconds: Optional[float] = None,
+    ):
+        self.ttl_seconds = ttl_seconds or float(os.environ.get("LLM_IDEMPOTENCY_TTL_SECONDS", "86400"))
+        # Une clé en cours abandonnée (instance arrêtée) se libère après ce délai
+        self.in_progress_ttl_seconds = in_progress_ttl_seconds or float(
+            os.environ.get("LLM_IDEMPOTENCY_IN_PROGRESS_TTL_SECONDS", "600")
+        )
+        self.wait_seconds = wait_seconds or float(os.environ.get("LLM_IDEMPOTENCY_WAIT_SECONDS", "120"))
+        self.store = store if store is not None else create_idempotency_store()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+        # Compteurs exposés par stats()
+        self.executed = 0
+        self.replayed = 0
+        self.joined = 0
+        self.conflicts = 0
+
+    async def run(
+        self,
+        key: str,
+        request_fingerprint: str,
+        func: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Retourne (réponse, rejouée). func() produit la réponse sérialisable à
+        enregistrer ; elle n'est appelée que si la clé est libre.
+        """
+        started = time.monotonic()
+        while True:
+            now = time.time()
+            record = {
+                "fingerprint": request_fingerprint,
+                "status": KEY_IN_PROGRESS,
+                "response": None,
+                "created_at": now,
+                "expires_at": now + self.in_progress_ttl_seconds,
+            }
+            existing = await self.store.claim(key, record)
+            if existing is None:
+                self.executed += 1
+                task = asyncio.ensure_future(self._execute(key, record, func))
+                self._in_flight[key] = task
+                # shield : une déconnexion du client n'interrompt pas le traitement,
+                # dont le résultat servira à sa prochaine tentative
+                return await asyncio.shield(task), False
+
+            if existing["fingerprint"] != request_fingerprint:
+                self.conflicts += 1
+                raise IdempotencyConflict("Clé d'idempotence déjà utilisée pour une requête différente")
+            if existing["status"] == KEY_COMPLETED:
+                self.replayed += 1
+                return existing["response"], True
+
+            task = self._in_flight.get(key)
+            if task is not None:
+                self.joined += 1
+                return await asyncio.shield(task), True
+
+            # Traitement en cours sur une autre instance : attente de sa réponse
+            if time.monotonic() - started > self.wait_seconds:
+                raise IdempotencyInProgress("Requête d'origine toujours en cours, réessayez plus tard")
+            await asyncio.sleep(0.25)
+
+    async def _execute(self, key: str, record: Dict[str, Any], func: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        try:
+            response = await func()
+        except BaseException:
+            await self.store.release(key)
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+        await self.store.save(key, dict(
+            record,
+            status=KEY_COMPLETED,
+            response=response,
+            expires_at=time.time() + self.ttl_seconds,
+        ))
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retourne les traitements exécutés, les réponses rejouées ou partagées
+        et les clés réutilisées avec une autre requête
+        """
+        return {
+            "in_flight": len(self._in_flight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "joined_in_flight": self.joined,
+            "conflicts": self.conflicts,
+        }
+
+    async def close(self):
+        await self.store.close()
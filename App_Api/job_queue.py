@@ -0,0 +1,472 @@
+# -*- coding: utf-8 -*-
+"""
+File de tâches de génération asynchrones
+Les demandes sont confiées à un groupe de workers ; le statut et le résultat de
+chaque tâche sont conservés dans un stockage (mémoire/SQLite ou MongoDB) pour
+être consultés plus tard ou envoyés à une URL de rappel
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import socket
+import sqlite3
+import ipaddress
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Statuts successifs d'une tâche
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+UNFINISHED_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# Erreur des tâches dont l'instance s'est arrêtée avant de les terminer
+INTERRUPTED_ERROR = "Tâche interrompue par l'arrêt du service, soumettez-la à nouveau"
+
+
+class JobQueueFull(Exception):
+    """
+    Levée lorsque la file de tâches a atteint sa capacité maximale
+    """
+
+
+class CallbackRejected(ValueError):
+    """
+    Levée lorsqu'une URL de rappel vise un hôte non autorisé ou une adresse
+    non publique (réseau privé, boucle locale, lien local...)
+    """
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address)
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+class LocalJobStore:
+    """
+    Stockage des tâches en mémoire, avec une copie SQLite optionnelle qui
+    survit aux redémarrages. Les tâches expirées sont purgées au fil de l'eau.
+    Les accès à SQLite s'exécutent hors de la boucle d'événements.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000, db_path: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Verrou propre à SQLite : la mémoire reste accessible pendant une écriture
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_jobs (id TEXT PRIMARY KEY, job TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    async def save(self, job: Dict[str, Any]):
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._jobs.move_to_end(job["id"])
+            self._prune()
+        if self._db is not None:
+            await asyncio.to_thread(self._write, [job])
+
+    def _write(self, jobs: List[Dict[str, Any]]):
+        rows = [(job["id"], json.dumps(job, ensure_ascii=False), job["expires_at"]) for job in jobs]
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db.executemany("INSERT OR REPLACE INTO llm_jobs (id, job, expires_at) VALUES (?, ?, ?)", rows)
+            self._db.execute("DELETE FROM llm_jobs WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            job = dict(job) if job is not None else None
+        if job is None and self._db is not None:
+            job = await asyncio.to_thread(self._read, job_id)
+        if job is None or job["expires_at"] <= now:
+            return None
+        return job
+
+    def _read(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT job FROM llm_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def touch(self, instance: str, now: float):
+        """
+        Renouvelle le signe de vie des tâches non terminées de l'instance
+        """
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.get("instance") == instance and job["status"] in UNFINISHED_STATUSES]
+            for job in jobs:
+                job["heartbeat_at"] = now
+        if jobs and self._db is not None:
+            await asyncio.to_thread(self._write, jobs)
+
+    async def fail_stale(self, before: float, now: float) -> int:
+        """
+        Marque en échec les tâches non terminées sans signe de vie depuis
+        `before` (instance arrêtée) ; retourne leur nombre
+        """
+        if self._db is None:
+            return 0
+        return await asyncio.to_thread(self._fail_stale, before, now)
+
+    def _fail_stale(self, before: float, now: float) -> int:
+        with self._db_lock:
+            if self._db is None:
+                return 0
+            cursor = self._db.execute(
+                "UPDATE llm_jobs SET job = json_set(job, '$.status', ?, '$.error', ?, '$.finished_at', ?) "
+                "WHERE json_extract(job, '$.status') IN (?, ?) AND COALESCE(json_extract(job, '$.heartbeat_at'), 0) < ?",
+                (JOB_FAILED, INTERRUPTED_ERROR, now, *UNFINISHED_STATUSES, before)
+            )
+            self._db.commit()
+            return cursor.rowcount
+
+    def _prune(self):
+        now = time.time()
+        while self._jobs:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest["expires_at"] > now and len(self._jobs) <= self.max_entries:
+                break
+            del self._jobs[oldest_id]
+
+    async def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class MongoJobStore:
+    """
+    Stockage des tâches dans MongoDB (motor). Un index TTL supprime les
+    tâches expirées.
+    """
+
+    def __init__(self, uri: str, db_name: str, collection: str = "llm_jobs"):
+        # Import différé : motor n'est requis que si MongoDB est configuré
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self._client = AsyncIOMotorClient(uri)
+        self._collection = self._client[db_name][collection]
+        self._indexed = False
+
+    async def save(self, job: Dict[str, Any]):
+        if not self._indexed:
+            await self._collection.create_index("expires_at_date", expireAfterSeconds=0)
+            self._indexed = True
+        document = dict(job, _id=job["id"], expires_at_date=_utc_datetime(job["expires_at"]))
+        await self._collection.replace_one({"_id": job["id"]}, document, upsert=True)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        document = await self._collection.find_one({"_id": job_id}, {"_id": 0, "expires_at_date": 0})
+        if document is None or document["expires_at"] <= time.time():
+            return None
+        return document
+
+    async def touch(self, instance: str, now: float):
+        await self._collection.update_many(
+            {"instance": instance, "status": {"$in": list(UNFINISHED_STATUSES)}},
+            {"$set": {"heartbeat_at": now}}
+        )
+
+    async def fail_stale(self, before: float, now: float) -> int:
+        result = await self._collection.update_many(
+            {
+                "status": {"$in": list(UNFINISHED_STATUSES)},
+                "$or": [{"heartbeat_at": {"$lt": before}}, {"heartbeat_at": {"$exists": False}}],
+            },
+            {"$set": {"status": JOB_FAILED, "error": INTERRUPTED_ERROR, "finished_at": now}}
+        )
+        return result.modified_count
+
+    async def close(self):
+        self._client.close()
+
+
+def _utc_datetime(timestamp: float):
+    from datetime import datetime, timezone
+
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+def create_job_store(ttl_seconds: float):
+    """
+    Choisit le stockage des tâches : MongoDB si LLM_JOBS_MONGODB_URI est
+    défini, sinon mémoire (et SQLite si LLM_JOBS_DB_PATH est défini)
+    """
+    mongodb_uri = os.environ.get("LLM_JOBS_MONGODB_URI")
+    if mongodb_uri:
+        return MongoJobStore(mongodb_uri, os.environ.get("LLM_JOBS_MONGODB_DB", "hackathon_aws"))
+    return LocalJobStore(ttl_seconds, db_path=os.environ.get("LLM_JOBS_DB_PATH"))
+
+
+class JobQueue:
+    """
+    Exécute les générations en arrière-plan sur un nombre borné de workers.
+    La tâche est enregistrée dès sa soumission puis mise à jour à chaque
+    changement de statut ; une URL de rappel reçoit la tâche terminée.
+
+    Chaque instance renouvelle régulièrement le signe de vie de ses tâches
+    non terminées ; au démarrage puis à chaque renouvellement, les tâches
+    restées en attente ou en cours sans signe de vie récent (instance
+    arrêtée ou redémarrée) sont marquées en échec.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        callback_timeout: Optional[float] = None,
+    ):
+        self.workers = workers or int(os.environ.get("LLM_JOBS_WORKERS", "4"))
+        self.max_queue = max_queue or int(os.environ.get("LLM_JOBS_MAX_QUEUE", "1000"))
+        self.ttl_seconds = ttl_seconds or float(os.environ.get("LLM_JOBS_TTL_SECONDS", "86400"))
+        self.callback_timeout = callback_timeout or float(os.environ.get("LLM_JOBS_CALLBACK_TIMEOUT_SECONDS", "10"))
+        # Hôtes autorisés pour les rappels ("exemple.com", ou ".exemple.com" pour ses sous-domaines) ; vide : tout hôte public
+        self.callback_allowed_hosts = [
+            host.strip().lower()
+            for host in os.environ.get("LLM_CALLBACK_ALLOWED_HOSTS", "").split(",")
+            if host.strip()
+        ]
+        self.heartbeat_seconds = float(os.environ.get("LLM_JOBS_HEARTBEAT_SECONDS", "30"))
+        self.store = store if store is not None else create_job_store(self.ttl_seconds)
+        self.instance = uuid.uuid4().hex
+
+        # Créés dans la boucle d'événements au premier appel
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._http = None
+
+        # Compteurs exposés par stats()
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.running = 0
+        self.callbacks_sent = 0
+        self.callbacks_failed = 0
+        self.interrupted = 0
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def start(self):
+        """
+        Démarre les workers et marque en échec les tâches laissées inachevées
+        par une instance arrêtée (démarrage de l'application)
+        """
+        self._ensure_started()
+        await self._fail_stale()
+
+    async def _fail_stale(self):
+        now = time.time()
+        count = await self.store.fail_stale(now - 3 * self.heartbeat_seconds, now)
+        if count:
+            self.interrupted += count
+            logger.warning("%d tâches interrompues par un arrêt du service marquées en échec", count)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await self.store.touch(self.instance, time.time())
+                await self._fail_stale()
+            except Exception:
+                logger.exception("Échec du renouvellement des tâches en cours")
+
+    async def _save(self, job: Dict[str, Any]):
+        job["heartbeat_at"] = time.time()
+        await self.store.save(job)
+
+    async def submit(
+        self,
+        kind: str,
+        func: Callable[[], Awaitable[Dict[str, Any]]],
+        callback_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Enregistre une tâche et la place dans la file. func() produit le
+        résultat (dictionnaire sérialisable) conservé avec la tâche.
+        """
+        self._ensure_started()
+        if self._queue.full():
+            raise JobQueueFull(f"File de tâches pleine ({self.max_queue} tâches en attente)")
+
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": JOB_QUEUED,
+            "result": None,
+            "error": None,
+            "callback_url": callback_url,
+            "instance": self.instance,
+            "heartbeat_at": now,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "expires_at": now + self.ttl_seconds,
+        }
+        await self._save(job)
+        self._queue.put_nowait((job, func))
+        self.submitted += 1
+        return job
+
+    def check_callback_url(self, url: str) -> str:
+        """
+        Vérifie le schéma et l'hôte d'une URL de rappel (liste des hôtes
+        autorisés, adresse IP littérale publique) ; lève CallbackRejected
+        """
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        if parts.scheme not in ("http", "https") or not host:
+            raise CallbackRejected("L'URL de rappel doit commencer par http:// ou https:// et désigner un hôte")
+        if self.callback_allowed_hosts and not any(
+            host == allowed or (allowed.startswith(".") and host.endswith(allowed))
+            for allowed in self.callback_allowed_hosts
+        ):
+            raise CallbackRejected(f"Hôte de rappel non autorisé: {host}")
+        if host == "localhost" or host.endswith(".localhost"):
+            raise CallbackRejected(f"Adresse de rappel non publique: {host}")
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            # Nom d'hôte : ses adresses sont vérifiées au moment de l'envoi
+            return url
+        if not _is_public_address(host):
+            raise CallbackRejected(f"Adresse de rappel non publique: {host}")
+        return url
+
+    async def _resolve_callback(self, url: str):
+        """
+        Vérifie l'URL puis résout son hôte ; toutes les adresses obtenues
+        doivent être publiques, sinon CallbackRejected est levée
+        """
+        self.check_callback_url(url)
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise CallbackRejected(f"Hôte de rappel introuvable: {parts.hostname} ({e})")
+        for info in infos:
+            if not _is_public_address(info[4][0]):
+                raise CallbackRejected(f"Hôte de rappel résolu vers une adresse non publique: {parts.hostname} ({info[4][0]})")
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job, func = await self._queue.get()
+            try:
+                await self._run(job, func)
+            except Exception:
+                logger.exception("Échec inattendu du traitement de la tâche %s", job["id"])
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any], func: Callable[[], Awaitable[Dict[str, Any]]]):
+        job.update(status=JOB_RUNNING, started_at=time.time())
+        await self._save(job)
+        self.running += 1
+        try:
+            job.update(status=JOB_SUCCEEDED, result=await func())
+            self.succeeded += 1
+        except Exception as e:
+            job.update(status=JOB_FAILED, error=str(getattr(e, "detail", e)))
+            self.failed += 1
+        finally:
+            self.running -= 1
+        job["finished_at"] = time.time()
+        await self._save(job)
+
+        if job["callback_url"]:
+            await self._send_callback(job)
+
+    async def _send_callback(self, job: Dict[str, Any]):
+        """
+        Envoie la tâche terminée à l'URL de rappel (un seul essai), après
+        avoir vérifié que son hôte se résout vers des adresses publiques
+        """
+        # Import différé : httpx n'est chargé que si une URL de rappel est utilisée
+        import httpx
+
+        try:
+            await self._resolve_callback(job["callback_url"])
+        except CallbackRejected as e:
+            self.callbacks_failed += 1
+            logger.warning("Rappel de la tâche %s refusé: %s", job["id"], e)
+            return
+
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=self.callback_timeout)
+        try:
+            response = await self._http.post(job["callback_url"], json=public_job(job))
+            response.raise_for_status()
+            self.callbacks_sent += 1
+        except httpx.HTTPError as e:
+            self.callbacks_failed += 1
+            logger.warning("Échec du rappel de la tâche %s vers %s: %s", job["id"], job["callback_url"], e)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retourne la profondeur de file et les compteurs de tâches
+        """
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "callbacks_sent": self.callbacks_sent,
+            "callbacks_failed": self.callbacks_failed,
+            "interrupted": self.interrupted,
+        }
+
+    async def close(self):
+        """
+        Arrête les workers et ferme le stockage et le client HTTP
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        await self.store.close()
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Représentation d'une tâche renvoyée aux clients
+    """
+    return {key: value for key, value in job.items() if key not in ("callback_url", "expires_at", "instance", "heartbeat_at")}
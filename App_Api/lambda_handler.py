@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Point d'entrée AWS Lambda
+Adapte l'application ASGI aux événements API Gateway et Function URL (Mangum).
+Le service LLM et ses clients sont créés pendant l'initialisation de la
+fonction, puis conservés d'une invocation à l'autre tant qu'elle reste chaude.
+
+Dépendance supplémentaire : pip install mangum
+Handler à configurer : lambda_handler.handler
+"""
+
+import os
+
+# Mode serverless : pas de fichier .env, configuration par l'environnement
+os.environ.setdefault("LLM_SERVERLESS", "1")
+
+from mangum import Mangum
+
+from main import app, llm_service, LLMProvider
+
+# Les clients sont créés dès l'initialisation plutôt qu'à la première requête
+if os.environ.get("LLM_EAGER_CLIENTS", "1") != "0":
+    if LLMProvider.AWS_BEDROCK in llm_service.providers:
+        llm_service.engine.bedrock_client
+    if LLMProvider.OPENAI in llm_service.providers:
+        llm_service.engine.openai_client
+
+# lifespan désactivé : l'environnement d'exécution est figé entre deux
+# invocations, les ressources sont libérées à sa destruction
+handler = Mangum(app, lifespan="off")
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur d'exécution des appels LLM
+Exécute les appels bloquants aux fournisseurs hors de la boucle d'événements,
+avec un client Bedrock unique et une limite de concurrence configurable.
+Les SDK des fournisseurs sont importés au premier appel, pour un démarrage rapide.
+"""
+
+import os
+import asyncio
+import threading
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+
+# Délais de lecture des clients Bedrock dédiés aux requêtes à échéance courte
+READ_TIMEOUT_BUCKETS = (2, 5, 10, 20, 30, 60)
+
+
+class UpstreamStream:
+    """
+    Flux de fragments d'un fournisseur, interrompable depuis un autre thread :
+    abort() ferme la connexion amont même pendant une lecture en cours
+    """
+
+    def __init__(self, chunks: Iterator[Any], abort: Optional[Callable[[], None]] = None):
+        self._chunks = chunks
+        self._abort = abort
+        self.aborted = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.aborted:
+            raise StopIteration
+        return next(self._chunks)
+
+    def abort(self):
+        if self.aborted:
+            return
+        self.aborted = True
+        if self._abort is not None:
+            try:
+                self._abort()
+            except Exception:
+                pass
+
+
+class GenerationEngine:
+    """
+    Exécute les appels aux fournisseurs LLM dans un pool de threads borné.
+
+    Le client Bedrock est créé une seule fois puis réutilisé par tous les appels,
+    avec un pool de connexions HTTP dimensionné pour la concurrence maximale.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_pool_connections: Optional[int] = None,
+        region: Optional[str] = None,
+    ):
+        self.max_concurrency = max_concurrency or int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+        self.max_pool_connections = max_pool_connections or int(
+            os.environ.get("BEDROCK_MAX_POOL_CONNECTIONS", str(self.max_concurrency))
+        )
+        self.region = region or os.environ.get("AWS_REGION", "us-east-1")
+        self.read_timeout = int(os.environ.get("BEDROCK_READ_TIMEOUT", "120"))
+        # Point d'accès alternatif (ex: fake_llm_server.py pour les mesures de charge)
+        self.endpoint_url = os.environ.get("BEDROCK_ENDPOINT_URL") or None
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="llm-engine"
+        )
+        # Le sémaphore est créé dans la boucle d'événements au premier appel
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bedrock_client = None
+        # Clients à délai de lecture réduit, créés à la demande (voir bedrock_client_for)
+        self._bedrock_clients: Dict[int, Any] = {}
+        self._openai = None
+        self._client_lock = threading.Lock()
+
+        # Compteurs exposés par stats()
+        self.in_flight = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.abandoned = 0
+        self.streams_aborted = 0
+
+    @property
+    def bedrock_client(self):
+        """
+        Retourne le client Bedrock Runtime partagé, créé au premier accès
+        """
+        if self._bedrock_client is None:
+            with self._client_lock:
+                if self._bedrock_client is None:
+                    self._bedrock_client = self._new_bedrock_client(self.read_timeout)
+        return self._bedrock_client
+
+    def bedrock_client_for(self, timeout: Optional[float]):
+        """
+        Retourne un client Bedrock dont le délai de lecture couvre `timeout`
+        secondes (arrondi au palier supérieur), ou le client partagé si le
+        délai restant dépasse celui de la configuration
+        """
+        if timeout is None:
+            return self.bedrock_client
+        bucket = next((bucket for bucket in READ_TIMEOUT_BUCKETS if bucket >= timeout), None)
+        if bucket is None or bucket >= self.read_timeout:
+            return self.bedrock_client
+        client = self._bedrock_clients.get(bucket)
+        if client is None:
+            with self._client_lock:
+                client = self._bedrock_clients.get(bucket)
+                if client is None:
+                    client = self._bedrock_clients[bucket] = self._new_bedrock_client(bucket)
+        return client
+
+    def _new_bedrock_client(self, read_timeout: int):
+        # Import différé : boto3 n'est chargé que si Bedrock est appelé
+        import boto3
+        from botocore.config import Config
+
+        return boto3.client(
+            service_name='bedrock-runtime',
+            region_name=self.region,
+            endpoint_url=self.endpoint_url,
+            config=Config(
+                max_pool_connections=self.max_pool_connections,
+                connect_timeout=min(read_timeout, 60),
+                read_timeout=read_timeout,
+                # Les limitations de débit sont réessayées par le contrôleur
+                # d'admission (délai aléatoire), pas par botocore
+                retries={"total_max_attempts": 1, "mode": "standard"}
+            )
+        )
+
+    @property
+    def openai_client(self):
+        """
+        Retourne le module OpenAI, importé et configuré (clé d'API) au premier accès
+        """
+        if self._openai is None:
+            with self._client_lock:
+                if self._openai is None:
+                    import openai
+
+                    openai.api_key = os.environ.get("OPENAI_API_KEY", "")
+                    self._openai = openai
+        return self._openai
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Exécute une fonction bloquante dans le pool de threads, dans la limite
+        de concurrence configurée. Les appels en excès attendent leur tour.
+        """
+        semaphore = self._get_semaphore()
+        self.queued += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # Le contexte (route en cours pour les métriques) suit l'appel dans le thread
+            context = contextvars.copy_context()
+            result = await loop.run_in_executor(
+                self._executor,
+                functools.partial(context.run, func, *args, **kwargs)
+            )
+            self.completed += 1
+            return result
+        except asyncio.CancelledError:
+            # Appelant parti (déconnexion, échéance) : la réponse sera ignorée
+            self.abandoned += 1
+            raise
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+
+    async def stream(self, func: Callable[..., Iterator[Any]], *args, **kwargs) -> AsyncIterator[Any]:
+        """
+        Exécute une fonction bloquante retournant un itérateur (flux de réponse
+        du fournisseur) et en relaie les éléments au fil de l'eau. L'emplacement
+        de concurrence est conservé jusqu'à la fin du flux. Si le consommateur
+        abandonne le flux, la connexion amont est fermée (UpstreamStream.abort).
+        """
+        semaphore = self._get_semaphore()
+        self.queued += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        iterator = None
+        try:
+            loop = asyncio.get_running_loop()
+            # Contexte partagé par les appels successifs (jamais simultanés) du flux
+            context = contextvars.copy_context()
+            iterator = await loop.run_in_executor(
+                self._executor,
+                functools.partial(context.run, func, *args, **kwargs)
+            )
+            sentinel = object()
+            while True:
+                item = await loop.run_in_executor(self._executor, context.run, next, iterator, sentinel)
+                if item is sentinel:
+                    break
+                yield item
+            self.completed += 1
+        except (GeneratorExit, asyncio.CancelledError):
+            # Flux abandonné par le consommateur
+            self.streams_aborted += 1
+            raise
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            # Fermeture du flux amont si le consommateur s'arrête en cours de route,
+            # y compris pendant une lecture en cours dans un thread
+            abort = getattr(iterator, "abort", None)
+            close = abort or getattr(iterator, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except ValueError:
+                    # Générateur encore en cours d'exécution dans un thread
+                    pass
+            self.in_flight -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retourne l'état courant du moteur (appels en cours, en attente, terminés)
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_pool_connections": self.max_pool_connections,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "abandoned": self.abandoned,
+            "streams_aborted": self.streams_aborted,
+        }
+
+    def shutdown(self):
+        """
+        Libère le pool de threads
+        """
+        self._executor.shutdown(wait=False)
+
+
+class _InFlightCall:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Regroupe les appels concurrents identiques : les appelants qui partagent
+    la même clé attendent le même appel en cours et en partagent le résultat.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _InFlightCall] = {}
+
+        # Compteurs exposés par stats()
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Exécute func() si aucun appel n'est en cours pour cette clé,
+        sinon attend le résultat de l'appel déjà lancé
+        """
+        call = self._calls.get(key)
+        # Un appel annulé n'est jamais rejoint : un nouvel appel est lancé
+        if call is None or call.task.cancelled():
+            call = _InFlightCall(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # shield : l'annulation d'un appelant n'interrompt pas l'appel partagé
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Plus personne n'attend ce résultat : la clé est libérée avant
+                # l'annulation, pour qu'une nouvelle demande lance son propre appel
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _InFlightCall):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retourne le nombre d'appels exécutés et d'appels économisés par regroupement
+        """
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+        }
@@ -5,22 +5,59 @@ Utilise FastAPI et AWS Bedrock pour générer des lettres personnalisées
 """
 
 import os
+import re
 import json
-from typing import Dict, List, Optional, Union
+import asyncio
+import logging
+import threading
+import contextvars
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
 from enum import Enum
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-import boto3
-from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field, field_validator
 from fastapi.middleware.cors import CORSMiddleware
-# Load environment variables from .env file
-load_dotenv()
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+# Load environment variables from .env file (inutile en mode serverless :
+# la configuration vient de l'environnement de la fonction)
+if not (os.environ.get("AWS_LAMBDA_FUNCTION_NAME") or os.environ.get("LLM_SERVERLESS")):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+from llm_engine import GenerationEngine, SingleFlight, UpstreamStream
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+from digests import DigestStore, estimate_tokens
+from token_budget import BudgetReport, TokenBudget
+from provider_router import ProviderRouter
+from admission import AdmissionController, AdmissionRejected
+from job_queue import JobQueue, JobQueueFull, public_job
+from idempotency import IdempotencyConflict, IdempotencyInProgress, IdempotencyManager, fingerprint
+from deadlines import CancelOnDisconnectMiddleware, DeadlineExceeded, abandoned, check_deadline, current_deadline, remaining_seconds, set_deadline, within_deadline
+from metrics import RouteMetricsMiddleware, current_route, observe_stage, observe_tier_call, observe_tokens, render_metrics, stage_timer
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Démarrage : les tâches laissées inachevées par un arrêt sont marquées en échec
+    await job_queue.start()
+    yield
+    # Arrêt : libération des workers de tâches, du pool de threads du moteur LLM et du cache
+    await job_queue.close()
+    await idempotency.close()
+    llm_service.engine.shutdown()
+    llm_service.cache.close()
+    llm_service.digests.close()
 
 # Configuration de l'API
 app = FastAPI(
     title="API de génération de lettres de motivation",
     description="Génère des lettres de motivation personnalisées à partir d'un profil et d'une offre d'emploi",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +66,101 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
 )
+# Étiquette les métriques de génération avec la route appelée
+app.add_middleware(RouteMetricsMiddleware, routes=app.routes)
+# Échéance des requêtes et annulation du traitement si le client se déconnecte
+app.add_middleware(CancelOnDisconnectMiddleware)
+# Niveaux de modèles : un modèle rapide et économique pour les textes courts,
+# un grand modèle pour les lettres complètes
+class ModelTier(BaseModel):
+    bedrock_model_id: str = Field(..., description="Identifiant du modèle AWS Bedrock")
+    openai_model: str = Field(..., description="Nom du modèle OpenAI")
+
+MODEL_TIERS: Dict[str, ModelTier] = {
+    "fast": ModelTier(
+        bedrock_model_id=os.environ.get("LLM_FAST_BEDROCK_MODEL", "anthropic.claude-3-haiku-20240307-v1:0"),
+        openai_model=os.environ.get("LLM_FAST_OPENAI_MODEL", "gpt-3.5-turbo")
+    ),
+    "large": ModelTier(
+        bedrock_model_id=os.environ.get("LLM_LARGE_BEDROCK_MODEL", "anthropic.claude-3-sonnet-20240229-v1:0"),
+        openai_model=os.environ.get("LLM_LARGE_OPENAI_MODEL", "gpt-4")
+    ),
+}
+
+# Profils de génération : modèle, budget de sortie et échantillonnage par type de tâche
+class GenerationProfile(BaseModel):
+    tier: str = Field("large", description="Niveau de modèle (fast ou large)")
+    bedrock_model_id: str = Field(..., description="Identifiant du modèle AWS Bedrock")
+    openai_model: str = Field(..., description="Nom du modèle OpenAI")
+    max_tokens: int = Field(..., description="Nombre maximal de jetons générés")
+    max_input_tokens: Optional[int] = Field(None, description="Budget de jetons d'entrée (prompt), réduit au-delà")
+    temperature: float = 0.7
+    top_p: float = 0.9
+    top_k: int = 250
+    stop_sequences: List[str] = Field(default_factory=list, description="Séquences qui arrêtent la génération")
+    fast_max_input_tokens: Optional[int] = Field(None, description="Au-delà de ce nombre de jetons d'entrée, le grand modèle est utilisé")
+    escalate_on_invalid: bool = Field(False, description="Régénère avec le grand modèle si la réponse du modèle rapide est invalide")
+    min_output_chars: Optional[int] = Field(None, description="Longueur minimale d'une réponse valide")
+    max_output_chars: Optional[int] = Field(None, description="Longueur maximale d'une réponse valide")
+
+def _tier_models(tier: str) -> Dict[str, str]:
+    return MODEL_TIERS[tier].model_dump()
+
+GENERATION_PROFILES: Dict[str, GenerationProfile] = {
+    # Lettre complète (en-tête, trois parties, signature)
+    "cover_letter": GenerationProfile(
+        tier="large",
+        **_tier_models("large"),
+        max_tokens=1500,
+        max_input_tokens=1000
+    ),
+    # Lettre plus courte, pour les candidatures rapides
+    "cover_letter_concise": GenerationProfile(
+        tier="fast",
+        **_tier_models("fast"),
+        max_tokens=800,
+        max_input_tokens=700,
+        fast_max_input_tokens=1200,
+        escalate_on_invalid=True,
+        min_output_chars=400
+    ),
+    # Message de connexion de 300 caractères au plus (environ 100 jetons)
+    "connection_message": GenerationProfile(
+        tier="fast",
+        **_tier_models("fast"),
+        max_tokens=200,
+        max_input_tokens=600,
+        temperature=0.8,
+        fast_max_input_tokens=1500,
+        escalate_on_invalid=True,
+        min_output_chars=40,
+        max_output_chars=330
+    ),
+}
+
+# Formules d'introduction que les consignes interdisent (réponse à régénérer)
+PREAMBLE_PATTERN = re.compile(r"^\s*(voici|bien sûr|certainement|here is|sure)\b", re.IGNORECASE)
+
+# Jetons consommés par l'appel en cours (rempli par _record_usage)
+_call_usage: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar("call_usage", default=None)
+
+def _check_profile_name(value: Optional[str]) -> Optional[str]:
+    if value is not None and value not in GENERATION_PROFILES:
+        raise ValueError(f"Profil de génération inconnu: {value} (disponibles: {', '.join(GENERATION_PROFILES)})")
+    return value
+
+def _check_callback_url(value: Optional[str]) -> Optional[str]:
+    if value is not None:
+        job_queue.check_callback_url(value)
+    return value
+
+def _check_batch_items(items: List[Any]) -> List[Any]:
+    # Un lot est traité en une seule requête : le mode asynchrone et le rappel ne s'appliquent pas à ses demandes
+    for index, item in enumerate(items):
+        if item.async_mode or item.callback_url is not None:
+            raise ValueError(f"Demande {index} : async_mode et callback_url ne sont pas pris en charge dans un lot")
+    return items
+
 # Modèles de données
 class User(BaseModel):
     name: str = Field(..., description="Nom complet du candidat")
@@ -54,64 +186,710 @@ class ConnectionRequest(BaseModel):
     user: User
     target: Target
     common_points: Optional[List[str]] = Field(None, description="Points communs entre l'utilisateur et la cible (école, domaine, intérêts)")
+    variants: int = Field(1, ge=1, le=5, description="Nombre de versions distinctes à générer (tons différents)")
+    no_cache: bool = Field(False, description="Ignore le cache de réponses et force un nouvel appel au modèle")
+    profile: Optional[str] = Field(None, description="Profil de génération (par défaut : connection_message)")
+    async_mode: bool = Field(False, description="Crée une tâche en arrière-plan et renvoie son identifiant (202)")
+    timeout_seconds: Optional[float] = Field(None, gt=0, le=600, description="Délai maximal de la génération ; au-delà, la requête échoue (504)")
+    callback_url: Optional[str] = Field(None, description="URL appelée (POST) à la fin de la tâche, en mode asynchrone")
+    
+    _check_profile = field_validator("profile")(_check_profile_name)
+    _check_callback = field_validator("callback_url")(_check_callback_url)
+
+class GenerationMetadata(BaseModel):
+    profile: str = Field(..., description="Profil de génération utilisé")
+    provider: str = Field(..., description="Fournisseur LLM utilisé")
+    model: str = Field(..., description="Modèle utilisé")
+    max_tokens: int = Field(..., description="Budget de jetons en sortie")
+    tier: Optional[str] = Field(None, description="Niveau de modèle utilisé (fast ou large)")
+    escalated: bool = Field(False, description="Réponse régénérée avec le grand modèle")
+    input_tokens_saved: int = Field(0, description="Jetons d'entrée retirés par le budget du prompt (estimation)")
+    token_budget_ms: Optional[float] = Field(None, description="Durée de l'étape de budget du prompt")
+    cached: bool = Field(False, description="Réponse servie depuis le cache")
 
 class ConnectionResponse(BaseModel):
     message: str = Field(..., description="Message de connexion généré")
+    variants: Optional[List[str]] = Field(None, description="Versions générées lorsque variants > 1 (la première est reprise dans message)")
+    metadata: Optional[GenerationMetadata] = Field(None, description="Informations sur la génération")
 
 class GenerateRequest(BaseModel):
     user: User
     job: Job
+    no_cache: bool = Field(False, description="Ignore le cache de réponses et force un nouvel appel au modèle")
+    profile: Optional[str] = Field(None, description="Profil de génération (par défaut : cover_letter)")
+    async_mode: bool = Field(False, description="Crée une tâche en arrière-plan et renvoie son identifiant (202)")
+    timeout_seconds: Optional[float] = Field(None, gt=0, le=600, description="Délai maximal de la génération ; au-delà, la requête échoue (504)")
+    callback_url: Optional[str] = Field(None, description="URL appelée (POST) à la fin de la tâche, en mode asynchrone")
+    
+    _check_profile = field_validator("profile")(_check_profile_name)
+    _check_callback = field_validator("callback_url")(_check_callback_url)
 
 class GenerateResponse(BaseModel):
     letter: str = Field(..., description="Lettre de motivation générée")
+    metadata: Optional[GenerationMetadata] = Field(None, description="Informations sur la génération")
+
+class BatchGenerateRequest(BaseModel):
+    items: List[GenerateRequest] = Field(..., max_length=500, description="Liste des demandes de lettres de motivation")
+    max_concurrency: int = Field(8, ge=1, le=64, description="Nombre maximal de générations simultanées pour ce lot")
+    stream: bool = Field(False, description="Renvoie les résultats en NDJSON au fur et à mesure de leur achèvement")
+    
+    _check_items = field_validator("items")(_check_batch_items)
+
+class BatchConnectionRequest(BaseModel):
+    items: List[ConnectionRequest] = Field(..., max_length=500, description="Liste des demandes de messages de connexion")
+    max_concurrency: int = Field(8, ge=1, le=64, description="Nombre maximal de générations simultanées pour ce lot")
+    stream: bool = Field(False, description="Renvoie les résultats en NDJSON au fur et à mesure de leur achèvement")
+    
+    _check_items = field_validator("items")(_check_batch_items)
+
+class BatchGenerateItem(BaseModel):
+    index: int = Field(..., description="Position de la demande dans le lot")
+    letter: Optional[str] = Field(None, description="Lettre de motivation générée")
+    metadata: Optional[GenerationMetadata] = Field(None, description="Informations sur la génération")
+    error: Optional[str] = Field(None, description="Erreur rencontrée pour cette demande")
+
+class BatchConnectionItem(BaseModel):
+    index: int = Field(..., description="Position de la demande dans le lot")
+    message: Optional[str] = Field(None, description="Message de connexion généré")
+    variants: Optional[List[str]] = Field(None, description="Versions générées lorsque variants > 1")
+    metadata: Optional[GenerationMetadata] = Field(None, description="Informations sur la génération")
+    error: Optional[str] = Field(None, description="Erreur rencontrée pour cette demande")
+
+class BatchGenerateResponse(BaseModel):
+    results: List[BatchGenerateItem]
+    succeeded: int
+    failed: int
+
+class BatchConnectionResponse(BaseModel):
+    results: List[BatchConnectionItem]
+    succeeded: int
+    failed: int
+
+class JobAcceptedResponse(BaseModel):
+    job_id: str = Field(..., description="Identifiant de la tâche")
+    status: str = Field(..., description="Statut de la tâche (queued)")
+    status_url: str = Field(..., description="Route de consultation de la tâche")
+
+class JobStatusResponse(BaseModel):
+    id: str
+    kind: str = Field(..., description="Type de génération (letter ou connection)")
+    status: str = Field(..., description="queued, running, succeeded ou failed")
+    result: Optional[Dict[str, Any]] = Field(None, description="Réponse de la génération, une fois la tâche réussie")
+    error: Optional[str] = Field(None, description="Erreur rencontrée, si la tâche a échoué")
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
 
 class LLMProvider(str, Enum):
     OPENAI = "openai"
     AWS_BEDROCK = "aws_bedrock"
+    LOCAL = "local"  # Fournisseur local de substitution (développement et tests)
+
+LOCAL_MODEL = "local-stub"
+
+class GenerationResult(NamedTuple):
+    text: str
+    metadata: GenerationMetadata
+    variants: Optional[List[str]] = None
+
+# Modèles Bedrock prenant en charge le cache de prompt (marqueurs cache_control)
+PROMPT_CACHING_MODELS = (
+    "anthropic.claude-3-5-haiku",
+    "anthropic.claude-3-7-sonnet",
+    "anthropic.claude-sonnet-4",
+    "anthropic.claude-opus-4",
+)
+
+def _supports_prompt_caching(model_id: str) -> bool:
+    """
+    Indique si le modèle Bedrock accepte les marqueurs de cache de prompt
+    """
+    return any(prefix in model_id for prefix in PROMPT_CACHING_MODELS)
+
+class Prompt(NamedTuple):
+    system: str  # Consignes statiques, identiques d'un appel à l'autre
+    user: str  # Données propres à la requête
+
+# Consignes statiques des prompts : envoyées en premier et sans aucune donnée
+# variable, pour que le fournisseur puisse réutiliser ce préfixe d'un appel à l'autre
+COVER_LETTER_INSTRUCTIONS = """Tu es un expert en rédaction de lettres de motivation professionnelles. 
+Génère une lettre de motivation formelle et professionnelle pour la personne décrite dans le message de l'utilisateur, qui postule à l'offre d'emploi décrite, sans aucun texte d'introduction ou de conclusion de ta part.
+
+CONSIGNES:
+1. Rédige une lettre de motivation formelle et professionnelle
+2. Mets en avant les compétences du candidat qui correspondent aux exigences du poste
+3. Utilise un ton professionnel et engageant
+4. Structure la lettre avec une introduction, un développement et une conclusion
+5. N'invente aucune information qui n'est pas fournie dans le profil
+6. Adapte le contenu au secteur d'activité et au poste
+7. Inclus la date du jour en haut de la lettre
+8. Termine par une formule de politesse appropriée
+
+FORMAT:
+- Lettre complète avec en-tête, corps et signature
+- Texte brut (pas de mise en forme HTML)
+"""
+
+CONNECTION_INSTRUCTIONS = """Tu es un expert en réseautage professionnel. 
+Génère un message de connexion personnalisé pour établir un premier contact sur LinkedIn ou une plateforme similaire, à partir des profils décrits dans le message de l'utilisateur.
+
+CONSIGNES:
+1. Rédige un message court et percutant (maximum 300 caractères)
+2. Mentionne clairement les points communs ou la raison de la connexion
+3. Sois professionnel mais chaleureux
+4. Évite les formules génériques comme "Je souhaite ajouter votre profil à mon réseau"
+5. Inclus une question ouverte ou une proposition de valeur pour encourager une réponse
+6. N'invente aucune information qui n'est pas fournie dans les profils
+
+FORMAT:
+- Message court et direct, prêt à être envoyé
+- Pas de formule d'introduction ou de signature (elles sont ajoutées automatiquement par la plateforme)
+"""
+
+# Versions multiples d'un message : tons proposés dans l'ordre, et consignes
+# de séparation ajoutées au préfixe statique
+VARIANT_TONES = [
+    "chaleureux et direct",
+    "formel et concis",
+    "enthousiaste, centré sur les points communs",
+    "très court (moins de 150 caractères)",
+    "curieux, construit autour d'une question",
+]
+
+VARIANTS_INSTRUCTIONS = """
+PLUSIEURS VERSIONS:
+Lorsque le message de l'utilisateur demande plusieurs versions, rédige-les toutes, chacune avec le ton indiqué et dans le respect des consignes ci-dessus.
+Fais précéder chaque version d'une ligne contenant uniquement "### VERSION n" (n étant le numéro de la version), sans aucun autre texte.
+"""
+
+VARIANT_MARKER = re.compile(r"^[ \t]*#{1,3}[ \t]*VERSION[ \t]+(\d+)[ \t]*:?[ \t]*$", re.MULTILINE | re.IGNORECASE)
+
+# Fournisseurs capables de produire plusieurs versions séparées en un seul appel
+MULTI_VARIANT_PROVIDERS = {LLMProvider.AWS_BEDROCK, LLMProvider.OPENAI}
+
+def _split_variants(text: str) -> List[str]:
+    """
+    Découpe une réponse en versions selon les lignes "### VERSION n"
+    """
+    # split() avec un groupe capturant : [avant, n1, texte1, n2, texte2, ...]
+    parts = VARIANT_MARKER.split(text)
+    return [part.strip() for part in parts[2::2] if part.strip()]
 
 # Classe pour gérer les différents fournisseurs de LLM
 class LLMService:
-    def __init__(self, provider: LLMProvider = LLMProvider.AWS_BEDROCK):
+    def __init__(
+        self,
+        provider: LLMProvider = LLMProvider.AWS_BEDROCK,
+        engine: Optional[GenerationEngine] = None,
+        cache: Optional[ResponseCache] = None,
+        fallback_providers: Optional[List[LLMProvider]] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        digests: Optional[DigestStore] = None,
+        token_budget: Optional[TokenBudget] = None,
+        admission: Optional[AdmissionController] = None
+    ):
         self.provider = provider
+        # Le routeur choisit parmi le fournisseur principal et ses fournisseurs de secours
+        self.providers = [provider] + [p for p in (fallback_providers or []) if p != provider]
+        # Le bouchon local répond instantanément : en secours, il ne sert qu'en dernier recours
+        last_resort = [LLMProvider.LOCAL.value] if provider != LLMProvider.LOCAL else []
+        self.router = ProviderRouter([p.value for p in self.providers], last_resort=last_resort)
+        self.admission = admission or AdmissionController()
+        self.engine = engine or GenerationEngine()
+        self.cache = cache or ResponseCache()
+        # Messages de connexion quasi identiques (optionnel, LLM_SEMANTIC_CACHE=1)
+        self.semantic_cache = semantic_cache or SemanticCache()
+        # Résumés des profils et des offres, réutilisés d'un appel à l'autre
+        self.digests = digests or DigestStore()
+        # Budget de jetons d'entrée par profil (réduction des champs longs)
+        self.token_budget = token_budget or TokenBudget()
+        # Routage par niveau de modèle (LLM_TIER_ROUTING=0 : grand modèle pour tout)
+        self.tier_routing = os.environ.get("LLM_TIER_ROUTING", "1") != "0"
+        self.tier_usage = {
+            tier: {"calls": 0, "escalations": 0, "input_tokens": 0, "output_tokens": 0, "latency_seconds": 0.0}
+            for tier in MODEL_TIERS
+        }
+        self.single_flight = SingleFlight()
+        self.token_usage = {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0
+        }
+        self._usage_lock = threading.Lock()
     
-    def generate_letter(self, user: User, job: Job) -> str:
+    async def generate_letter(
+        self,
+        user: User,
+        job: Job,
+        use_cache: bool = True,
+        profile: Optional[str] = None
+    ) -> GenerationResult:
         """
         Génère une lettre de motivation en utilisant le fournisseur LLM configuré
         """
-        # Construction du prompt pour le LLM
-        prompt = self._build_prompt(user, job)
+        # Construction du prompt pour le LLM, hors de la boucle d'événements
+        # (résumés lus dans leur base SQLite, réduction au budget de jetons)
+        profile_name = profile or "cover_letter"
+        with stage_timer("prompt_build"):
+            prompt, budget = await asyncio.to_thread(self._build_prompt, user, job, profile_name)
         
         # Génération de la lettre selon le fournisseur
-        if self.provider == LLMProvider .OPENAI:
-            return self._generate_with_openai(prompt)
-        elif self.provider == LLMProvider.AWS_BEDROCK:
-            return self._generate_with_aws_bedrock(prompt)
-        else:
-            raise ValueError(f"Fournisseur LLM non pris en charge: {self.provider}")
+        result = await self._generate(prompt, profile_name, use_cache)
+        return self._with_budget(result, budget)
     
-    def generate_connection_message(self, user: User, target: Target, common_points: Optional[List[str]] = None) -> str:
+    async def generate_connection_message(
+        self,
+        user: User,
+        target: Target,
+        common_points: Optional[List[str]] = None,
+        use_cache: bool = True,
+        profile: Optional[str] = None,
+        variants: int = 1
+    ) -> GenerationResult:
         """
-        Génère un message de connexion personnalisé
+        Génère un message de connexion personnalisé, ou plusieurs versions
+        distinctes lorsque variants > 1
         """
-        # Construction du prompt pour le LLM
-        prompt = self._build_connection_prompt(user, target, common_points)
+        # Construction du prompt pour le LLM, hors de la boucle d'événements
+        profile_name = profile or "connection_message"
+        with stage_timer("prompt_build"):
+            prompt, budget = await asyncio.to_thread(self._build_connection_prompt, user, target, common_points, profile_name)
         
         # Génération du message selon le fournisseur
-        if self.provider == LLMProvider.OPENAI:
-            return self._generate_with_openai(prompt)
-        elif self.provider == LLMProvider.AWS_BEDROCK:
-            return self._generate_with_aws_bedrock(prompt)
+        result = await self._generate_connection(prompt, user, target, common_points, profile_name, use_cache, variants)
+        return self._with_budget(result, budget)
+    
+    async def _generate_connection(
+        self,
+        prompt: Prompt,
+        user: User,
+        target: Target,
+        common_points: Optional[List[str]],
+        profile_name: str,
+        use_cache: bool,
+        variants: int
+    ) -> GenerationResult:
+        """
+        Génère le message à partir du prompt : versions multiples, cache
+        sémantique ou appel direct
+        """
+        if variants > 1:
+            return await self._generate_variants(prompt, profile_name, variants, use_cache)
+        if not (use_cache and self.semantic_cache.enabled):
+            return await self._generate(prompt, profile_name, use_cache)
+        
+        # Cache sémantique : la demande sans le nom de la cible sert de clé
+        # approchée, le message retrouvé est repersonnalisé avec ce nom
+        provider = LLMProvider(self.router.ranked()[0])
+        segments = (
+            " ".join([user.name, user.title, user.experience, " ".join(user.skills), user.goals]),
+            " ".join([target.title, target.company, target.background or "", " ".join(target.interests or [])]),
+            " ".join(common_points or []),
+        )
+        # Vectorisation et recherche hors de la boucle d'événements
+        with stage_timer("semantic_lookup"):
+            cached = await asyncio.to_thread(self.semantic_cache.lookup, self._semantic_scope(profile_name, provider), segments, target.name)
+        if cached is not None:
+            return GenerationResult(cached, self.generation_metadata(profile_name, cached=True, provider=provider))
+        result = await self._generate(prompt, profile_name, use_cache)
+        # Le message est indexé sous le fournisseur qui l'a réellement produit
+        scope = self._semantic_scope(profile_name, LLMProvider(result.metadata.provider))
+        await asyncio.to_thread(self.semantic_cache.add, scope, segments, target.name, result.text)
+        return result
+    
+    async def stream_letter(
+        self,
+        user: User,
+        job: Job,
+        use_cache: bool = True,
+        profile: Optional[str] = None,
+        on_start: Optional[Callable[[GenerationMetadata], None]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Génère une lettre de motivation en flux, fragment par fragment
+        """
+        profile_name = profile or "cover_letter"
+        with stage_timer("prompt_build"):
+            prompt, _ = await asyncio.to_thread(self._build_prompt, user, job, profile_name)
+        async for chunk in self._stream(prompt, profile_name, use_cache, on_start):
+            yield chunk
+    
+    async def stream_connection_message(
+        self,
+        user: User,
+        target: Target,
+        common_points: Optional[List[str]] = None,
+        use_cache: bool = True,
+        profile: Optional[str] = None,
+        on_start: Optional[Callable[[GenerationMetadata], None]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Génère un message de connexion en flux, fragment par fragment
+        """
+        profile_name = profile or "connection_message"
+        with stage_timer("prompt_build"):
+            prompt, _ = await asyncio.to_thread(self._build_connection_prompt, user, target, common_points, profile_name)
+        async for chunk in self._stream(prompt, profile_name, use_cache, on_start):
+            yield chunk
+    
+    def generation_metadata(
+        self,
+        profile_name: str,
+        cached: bool = False,
+        provider: Optional[LLMProvider] = None,
+        profile: Optional[GenerationProfile] = None,
+        escalated: bool = False
+    ) -> GenerationMetadata:
+        """
+        Décrit la génération effectuée avec un profil (par défaut pour le fournisseur principal)
+        """
+        provider = provider or self.provider
+        profile = profile or GENERATION_PROFILES[profile_name]
+        return GenerationMetadata(
+            profile=profile_name,
+            provider=provider.value,
+            model=self._model_for(provider, profile),
+            max_tokens=profile.max_tokens,
+            tier=profile.tier,
+            escalated=escalated,
+            cached=cached
+        )
+    
+    def _route(self, profile_name: str, prompt: Prompt) -> GenerationProfile:
+        """
+        Choisit le niveau de modèle d'une génération : le modèle rapide du
+        profil, sauf si l'entrée dépasse son seuil de taille
+        """
+        profile = GENERATION_PROFILES[profile_name]
+        if profile.tier == "large":
+            return profile
+        if not self.tier_routing:
+            return self._with_tier(profile, "large")
+        if profile.fast_max_input_tokens and estimate_tokens(prompt.system + prompt.user) > profile.fast_max_input_tokens:
+            return self._with_tier(profile, "large")
+        return profile
+    
+    @staticmethod
+    def _with_tier(profile: GenerationProfile, tier: str) -> GenerationProfile:
+        return profile.model_copy(update={"tier": tier, **_tier_models(tier)})
+    
+    @staticmethod
+    def _is_valid_output(text: str, profile: GenerationProfile) -> bool:
+        """
+        Vérification peu coûteuse de la réponse : longueur et absence de
+        formule d'introduction
+        """
+        if not text or PREAMBLE_PATTERN.match(text):
+            return False
+        if profile.min_output_chars and len(text) < profile.min_output_chars:
+            return False
+        if profile.max_output_chars and len(text) > profile.max_output_chars:
+            return False
+        return True
+    
+    def _model_for(self, provider: LLMProvider, profile: GenerationProfile) -> str:
+        """
+        Retourne le modèle d'un profil pour un fournisseur
+        """
+        if provider == LLMProvider.OPENAI:
+            return profile.openai_model
+        elif provider == LLMProvider.LOCAL:
+            return LOCAL_MODEL
+        return profile.bedrock_model_id
+    
+    def _semantic_scope(self, profile_name: str, provider: LLMProvider) -> str:
+        """
+        Portée du cache sémantique : seuls les messages du même profil, générés
+        par le même fournisseur et le même modèle, sont comparés
+        """
+        model = self._model_for(provider, GENERATION_PROFILES[profile_name])
+        return f"{profile_name}|{provider.value}|{model}"
+    
+    def _cache_key(self, prompt: Prompt, profile: GenerationProfile, provider: LLMProvider) -> str:
+        """
+        Calcule la clé de cache pour le prompt, le profil et le fournisseur
+        """
+        model = self._model_for(provider, profile)
+        params = profile.model_dump(exclude={"bedrock_model_id", "openai_model"})
+        return ResponseCache.make_key(prompt.system + prompt.user, provider.value, model, params)
+    
+    async def _cached(self, prompt: Prompt, profile: GenerationProfile) -> Optional[Tuple[str, LLMProvider]]:
+        """
+        Cherche une réponse en cache produite par l'un des fournisseurs, du plus
+        au moins favorable ; retourne (texte, fournisseur qui l'a produite)
+        """
+        keys = {self._cache_key(prompt, profile, LLMProvider(name)): LLMProvider(name) for name in self.router.ranked()}
+        found = await self.cache.lookup_async(list(keys))
+        if found is None:
+            return None
+        key, text = found
+        return text, keys[key]
+    
+    async def _stream(
+        self,
+        prompt: Prompt,
+        profile_name: str,
+        use_cache: bool = True,
+        on_start: Optional[Callable[[GenerationMetadata], None]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Ouvre un flux de génération auprès du fournisseur configuré. Le niveau
+        de modèle est choisi selon la taille de l'entrée (pas de régénération :
+        le texte est déjà transmis au client). on_start reçoit, avant le premier
+        fragment, la description du fournisseur et du niveau qui servent le flux.
+        """
+        profile = self._route(profile_name, prompt)
+        use_cache = use_cache and self.cache.enabled
+        if use_cache:
+            cached = await self._cached(prompt, profile)
+            if cached is not None:
+                text, provider = cached
+                if on_start is not None:
+                    on_start(self.generation_metadata(profile_name, cached=True, provider=provider, profile=profile))
+                yield text
+                return
+        
+        # Un flux ne peut pas être couvert ni basculé en cours de route :
+        # il est ouvert auprès du fournisseur actuellement le plus favorable
+        provider = LLMProvider(self.router.ranked()[0])
+        if provider == LLMProvider.OPENAI:
+            func = self._stream_with_openai
+        elif provider == LLMProvider.AWS_BEDROCK:
+            func = self._stream_with_aws_bedrock
+        elif provider == LLMProvider.LOCAL:
+            func = self._stream_with_local
         else:
-            raise ValueError(f"Fournisseur LLM non pris en charge: {self.provider}")
+            raise ValueError(f"Fournisseur LLM non pris en charge: {provider}")
+        if on_start is not None:
+            on_start(self.generation_metadata(profile_name, provider=provider, profile=profile))
+        
+        model = self._model_for(provider, profile)
+        parts = []
+        try:
+            async with self._admitted():
+                started = time.perf_counter()
+                chunks = self.engine.stream(self._dequeued, func, provider, started, prompt, profile)
+                try:
+                    while True:
+                        # Chaque fragment est attendu au plus jusqu'à l'échéance ; à
+                        # l'abandon, le moteur ferme le flux amont
+                        try:
+                            chunk = await within_deadline(chunks.__anext__())
+                        except StopAsyncIteration:
+                            break
+                        if not parts:
+                            observe_stage("first_chunk", time.perf_counter() - started, provider.value, model)
+                        parts.append(chunk)
+                        yield chunk
+                finally:
+                    await chunks.aclose()
+                observe_stage("generation", time.perf_counter() - started, provider.value, model)
+        except DeadlineExceeded as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        # Seul un flux complet est mis en cache
+        if use_cache:
+            self.cache.set(self._cache_key(prompt, profile, provider), "".join(parts).strip())
     
-    def _build_prompt(self, user: User, job: Job) -> str:
+    async def _generate(
+        self,
+        prompt: Prompt,
+        profile_name: str,
+        use_cache: bool = True,
+        profile: Optional[GenerationProfile] = None
+    ) -> GenerationResult:
         """
-        Construit un prompt structuré pour le LLM
+        Appelle le fournisseur configuré via le moteur, hors de la boucle d'événements.
+        profile remplace le profil nommé (ex: budget de sortie élargi) ; sinon
+        le niveau de modèle est choisi par _route, et une réponse invalide du
+        modèle rapide est régénérée avec le grand modèle si le profil le prévoit.
         """
-        prompt = f"""
-Tu es un expert en rédaction de lettres de motivation professionnelles. 
-Génère une lettre de motivation formelle et professionnelle pour la personne suivante qui postule à une offre d'emploi, sans aucun texte d'introduction ou de conclusion de ta part.
-
+        escalation_allowed = profile is None
+        profile = profile or self._route(profile_name, prompt)
+        use_cache = use_cache and self.cache.enabled
+        if use_cache:
+            cached = await self._cached(prompt, profile)
+            if cached is not None:
+                text, provider = cached
+                return GenerationResult(text, self.generation_metadata(profile_name, cached=True, provider=provider, profile=profile))
+        
+        # Les demandes identiques simultanées partagent un seul appel au fournisseur
+        # (quel qu'il soit, d'où la clé du fournisseur principal) ; chacune
+        # n'attend que jusqu'à sa propre échéance
+        flight_key = self._cache_key(prompt, profile, self.provider)
+        try:
+            text, provider = await within_deadline(self.single_flight.do(flight_key, lambda: self._shared_call_tier(prompt, profile)))
+        except DeadlineExceeded as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        
+        if escalation_allowed and profile.tier != "large" and profile.escalate_on_invalid and not self._is_valid_output(text, profile):
+            self.tier_usage[profile.tier]["escalations"] += 1
+            large_profile = self._with_tier(profile, "large")
+            result = await self._generate(prompt, profile_name, use_cache, profile=large_profile)
+            # La réponse du grand modèle sert aussi les prochaines demandes identiques
+            if use_cache:
+                self.cache.set(self._cache_key(prompt, profile, LLMProvider(result.metadata.provider)), result.text)
+            return result._replace(metadata=result.metadata.model_copy(update={"escalated": True}))
+        
+        # Réponse indexée sous le fournisseur qui l'a réellement produite (après une éventuelle bascule)
+        if use_cache:
+            self.cache.set(self._cache_key(prompt, profile, provider), text)
+        return GenerationResult(text, self.generation_metadata(profile_name, provider=provider, profile=profile))
+    
+    async def _shared_call_tier(self, prompt: Prompt, profile: GenerationProfile) -> Tuple[str, LLMProvider]:
+        """
+        Appel partagé entre demandes identiques : il s'exécute sans l'échéance
+        de la demande qui l'a lancé, chaque demande appliquant la sienne à son attente
+        """
+        current_deadline.set(None)
+        return await self._call_tier(prompt, profile)
+    
+    async def _call_tier(self, prompt: Prompt, profile: GenerationProfile) -> Tuple[str, LLMProvider]:
+        """
+        Appelle le fournisseur et cumule la latence et les jetons du niveau de modèle
+        """
+        usage: Dict[str, int] = {}
+        _call_usage.set(usage)
+        started = time.perf_counter()
+        result = await self._call_provider(prompt, profile)
+        elapsed = time.perf_counter() - started
+        
+        stats = self.tier_usage[profile.tier]
+        stats["calls"] += 1
+        stats["latency_seconds"] += elapsed
+        stats["input_tokens"] += usage.get("input_tokens", 0)
+        stats["output_tokens"] += usage.get("output_tokens", 0)
+        observe_tier_call(profile.tier, elapsed, usage.get("input_tokens"), usage.get("output_tokens"))
+        return result
+    
+    async def _generate_variants(self, prompt: Prompt, profile_name: str, count: int, use_cache: bool = True) -> GenerationResult:
+        """
+        Génère `count` versions de tons différents. Le fournisseur principal les
+        rédige en un seul appel lorsqu'il le permet ; les versions manquantes (ou
+        toutes, pour les autres fournisseurs) sont générées par appels parallèles.
+        """
+        tones = VARIANT_TONES[:count]
+        drafts: List[str] = []
+        metadata = None
+        if self.provider in MULTI_VARIANT_PROVIDERS:
+            # Un seul appel : budget de sortie multiplié par le nombre de versions
+            base = self._route(profile_name, prompt)
+            profile = base.model_copy(update={"max_tokens": base.max_tokens * count})
+            requested = "\n".join(f"- Version {index}: {tone}" for index, tone in enumerate(tones, 1))
+            variants_prompt = Prompt(
+                system=prompt.system + VARIANTS_INSTRUCTIONS,
+                user=prompt.user + f"\nVERSIONS DEMANDÉES ({count}):\n{requested}\n"
+            )
+            result = await self._generate(variants_prompt, profile_name, use_cache, profile=profile)
+            drafts = _split_variants(result.text)[:count]
+            metadata = result.metadata
+        
+        if len(drafts) < count:
+            results = await asyncio.gather(*[
+                self._generate(Prompt(prompt.system, prompt.user + f"\nTON SOUHAITÉ: {tone}\n"), profile_name, use_cache)
+                for tone in tones[len(drafts):]
+            ])
+            drafts += [result.text for result in results]
+            metadata = metadata or results[0].metadata
+        return GenerationResult(drafts[0], metadata, drafts)
+    
+    async def _call_provider(self, prompt: Prompt, profile: GenerationProfile) -> Tuple[str, LLMProvider]:
+        """
+        Appelle le fournisseur choisi par le routeur, avec bascule en cas d'erreur
+        """
+        async with self._admitted():
+            name, text = await self.router.call(
+                lambda name: self.admission.retry_throttled(
+                    lambda: self._call_single_provider(LLMProvider(name), prompt, profile)
+                )
+            )
+        return text, LLMProvider(name)
+    
+    @asynccontextmanager
+    async def _admitted(self) -> AsyncIterator[None]:
+        """
+        Attend une place auprès du contrôleur d'admission, ou rejette la demande
+        avec un code 429 et l'en-tête Retry-After lorsque le service est saturé
+        """
+        started = time.perf_counter()
+        try:
+            async with self.admission.admit():
+                observe_stage("admission_wait", time.perf_counter() - started)
+                yield
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)}
+            )
+    
+    async def _call_single_provider(self, provider: LLMProvider, prompt: Prompt, profile: GenerationProfile) -> str:
+        """
+        Appelle un fournisseur donné via le moteur
+        """
+        if provider == LLMProvider.OPENAI:
+            func = self._generate_with_openai
+        elif provider == LLMProvider.AWS_BEDROCK:
+            func = self._generate_with_aws_bedrock
+        elif provider == LLMProvider.LOCAL:
+            func = self._generate_with_local
+        else:
+            raise ValueError(f"Fournisseur LLM non pris en charge: {provider}")
+        return await self.engine.run(self._dequeued, func, provider, time.perf_counter(), prompt, profile)
+    
+    def _dequeued(
+        self,
+        func: Callable[[Prompt, GenerationProfile], Any],
+        provider: LLMProvider,
+        submitted: float,
+        prompt: Prompt,
+        profile: GenerationProfile
+    ) -> Any:
+        """
+        Exécute func dans un thread du moteur après avoir mesuré l'attente
+        d'un emplacement libre (sémaphore et pool de threads). L'appel n'est
+        pas lancé si l'échéance de la requête est déjà passée.
+        """
+        observe_stage("queue_wait", time.perf_counter() - submitted, provider.value, self._model_for(provider, profile))
+        check_deadline()
+        return func(prompt, profile)
+    
+    def _build_prompt(self, user: User, job: Job, profile_name: str = "cover_letter") -> Tuple[Prompt, BudgetReport]:
+        """
+        Construit le prompt d'une lettre à partir des données résumées, puis le
+        ramène au budget d'entrée du profil : description de l'offre puis
+        expérience réduites aux phrases liées aux compétences et aux exigences
+        """
+        digested_user = User(**self.digests.user(user.model_dump()))
+        digested_job = Job(**self.digests.job(job.model_dump()))
+        
+        def rebuild(changed: Dict[str, str]) -> Prompt:
+            trimmed_user, trimmed_job = digested_user, digested_job
+            if "description" in changed:
+                trimmed_job = Job(**self.digests.job(dict(job.model_dump(), description=changed["description"])))
+            if "experience" in changed:
+                trimmed_user = User(**self.digests.user(dict(user.model_dump(), experience=changed["experience"])))
+            return self._letter_prompt(trimmed_user, trimmed_job)
+        
+        return self._fit_budget(
+            profile_name,
+            self._letter_prompt(digested_user, digested_job),
+            fields={"description": job.description, "experience": user.experience},
+            sizes={
+                "description": estimate_tokens(digested_job.description),
+                "experience": estimate_tokens(digested_user.experience)
+            },
+            keywords=user.skills + job.requirements,
+            rebuild=rebuild
+        )
+    
+    @staticmethod
+    def _letter_prompt(user: User, job: Job) -> Prompt:
+        """
+        Construit un prompt structuré pour le LLM : consignes statiques
+        (préfixe cacheable) et données propres à la candidature
+        """
+        user_prompt = f"""
 PROFIL DU CANDIDAT:
 - Nom: {user.name}
 - Poste actuel: {user.title}
@@ -124,33 +902,49 @@ DÉTAILS DU POSTE:
 - Entreprise: {job.company}
 - Description: {job.description}
 - Compétences requises: {', '.join(job.requirements)}
-
-CONSIGNES:
-1. Rédige une lettre de motivation formelle et professionnelle
-2. Mets en avant les compétences du candidat qui correspondent aux exigences du poste
-3. Utilise un ton professionnel et engageant
-4. Structure la lettre avec une introduction, un développement et une conclusion
-5. N'invente aucune information qui n'est pas fournie dans le profil
-6. Adapte le contenu au secteur d'activité et au poste
-7. Inclus la date du jour en haut de la lettre
-8. Termine par une formule de politesse appropriée
-
-FORMAT:
-- Lettre complète avec en-tête, corps et signature
-- Texte brut (pas de mise en forme HTML)
 """
-        return prompt
+        return Prompt(system=COVER_LETTER_INSTRUCTIONS, user=user_prompt)
     
-    def _build_connection_prompt(self, user: User, target: Target, common_points: Optional[List[str]] = None) -> str:
+    def _build_connection_prompt(
+        self,
+        user: User,
+        target: Target,
+        common_points: Optional[List[str]] = None,
+        profile_name: str = "connection_message"
+    ) -> Tuple[Prompt, BudgetReport]:
         """
-        Construit un prompt pour générer un message de connexion
+        Construit le prompt d'un message de connexion, ramené au budget
+        d'entrée du profil : expérience de l'expéditeur et parcours du
+        destinataire réduits aux phrases liées aux intérêts et points communs
+        """
+        digested_user = User(**self.digests.user(user.model_dump()))
+        
+        def rebuild(changed: Dict[str, str]) -> Prompt:
+            trimmed_user, trimmed_target = digested_user, target
+            if "experience" in changed:
+                trimmed_user = User(**self.digests.user(dict(user.model_dump(), experience=changed["experience"])))
+            if "background" in changed:
+                trimmed_target = target.model_copy(update={"background": changed["background"]})
+            return self._connection_prompt(trimmed_user, trimmed_target, common_points)
+        
+        return self._fit_budget(
+            profile_name,
+            self._connection_prompt(digested_user, target, common_points),
+            fields={"experience": user.experience, "background": target.background or ""},
+            sizes={"experience": estimate_tokens(digested_user.experience)},
+            keywords=[target.title] + (target.interests or []) + (common_points or []),
+            rebuild=rebuild
+        )
+    
+    @staticmethod
+    def _connection_prompt(user: User, target: Target, common_points: Optional[List[str]] = None) -> Prompt:
+        """
+        Construit un prompt pour générer un message de connexion : consignes
+        statiques (préfixe cacheable) et profils propres à la demande
         """
         common_points_text = ", ".join(common_points) if common_points else "Aucun point commun spécifié"
         
-        prompt = f"""
-Tu es un expert en réseautage professionnel. 
-Génère un message de connexion personnalisé pour établir un premier contact sur LinkedIn ou une plateforme similaire.
-
+        user_prompt = f"""
 PROFIL DE L'EXPÉDITEUR:
 - Nom: {user.name}
 - Poste actuel: {user.title}
@@ -167,98 +961,272 @@ PROFIL DU DESTINATAIRE:
 
 POINTS COMMUNS:
 {common_points_text}
-
-CONSIGNES:
-1. Rédige un message court et percutant (maximum 300 caractères)
-2. Mentionne clairement les points communs ou la raison de la connexion
-3. Sois professionnel mais chaleureux
-4. Évite les formules génériques comme "Je souhaite ajouter votre profil à mon réseau"
-5. Inclus une question ouverte ou une proposition de valeur pour encourager une réponse
-6. N'invente aucune information qui n'est pas fournie dans les profils
-
-FORMAT:
-- Message court et direct, prêt à être envoyé
-- Pas de formule d'introduction ou de signature (elles sont ajoutées automatiquement par la plateforme)
 """
-        return prompt
+        return Prompt(system=CONNECTION_INSTRUCTIONS, user=user_prompt)
+    
+    def _fit_budget(
+        self,
+        profile_name: str,
+        prompt: Prompt,
+        fields: Dict[str, str],
+        sizes: Dict[str, int],
+        keywords: List[str],
+        rebuild: Callable[[Dict[str, str]], Prompt]
+    ) -> Tuple[Prompt, BudgetReport]:
+        """
+        Étape de budget : estime la taille du prompt et, au-delà de la limite
+        du profil, le reconstruit avec les champs réduits
+        """
+        started = time.perf_counter()
+        limit = GENERATION_PROFILES[profile_name].max_input_tokens
+        tokens_before = estimate_tokens(prompt.system + prompt.user)
+        changed, _ = self.token_budget.fit(tokens_before, limit, fields, keywords, sizes)
+        if changed:
+            prompt = rebuild(changed)
+        report = BudgetReport(limit, tokens_before, estimate_tokens(prompt.system + prompt.user), time.perf_counter() - started)
+        self.token_budget.record(report)
+        observe_stage("token_budget", report.seconds)
+        return prompt, report
     
-    def _generate_with_openai(self, prompt: str) -> str:
+    @staticmethod
+    def _with_budget(result: GenerationResult, budget: BudgetReport) -> GenerationResult:
+        """
+        Ajoute aux métadonnées les jetons retirés et la durée de l'étape de budget
+        """
+        if result.metadata is None:
+            return result
+        return result._replace(metadata=result.metadata.model_copy(update={
+            "input_tokens_saved": max(budget.tokens_saved, 0),
+            "token_budget_ms": round(budget.seconds * 1000, 3)
+        }))
+    
+    def _openai_request_params(self, prompt: Prompt, profile: GenerationProfile) -> Dict:
+        """
+        Construit les paramètres de requête OpenAI. Les consignes statiques
+        sont placées en tête pour bénéficier du cache de préfixe d'OpenAI ;
+        le délai de la requête HTTP suit l'échéance de la demande.
+        """
+        params = {
+            "model": profile.openai_model,
+            "messages": [
+                {"role": "system", "content": prompt.system},
+                {"role": "user", "content": prompt.user}
+            ],
+            "temperature": profile.temperature,
+            "max_tokens": profile.max_tokens,
+            "top_p": profile.top_p
+        }
+        if profile.stop_sequences:
+            params["stop"] = profile.stop_sequences
+        remaining = remaining_seconds()
+        if remaining is not None:
+            params["request_timeout"] = max(remaining, 0.1)
+        return params
+    
+    def _bedrock_request_body(self, prompt: Prompt, profile: GenerationProfile) -> str:
+        """
+        Construit le corps de requête Bedrock (format Claude 3). Les consignes
+        statiques sont envoyées en bloc système, marqué pour le cache de prompt
+        lorsque le modèle le prend en charge.
+        """
+        system_block = {"type": "text", "text": prompt.system}
+        if _supports_prompt_caching(profile.bedrock_model_id):
+            system_block["cache_control"] = {"type": "ephemeral"}
+        
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": profile.max_tokens,
+            "top_k": profile.top_k,
+            "temperature": profile.temperature,
+            "top_p": profile.top_p,
+            "system": [system_block],
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": prompt.user
+                        }
+                    ]
+                }
+            ]
+        }
+        if profile.stop_sequences:
+            body["stop_sequences"] = profile.stop_sequences
+        return json.dumps(body)
+    
+    def _record_usage(self, usage: Optional[Dict]):
+        """
+        Cumule les compteurs de jetons renvoyés par le fournisseur, y compris
+        les jetons lus depuis ou écrits dans le cache de prompt
+        """
+        if not usage:
+            return
+        call_usage = _call_usage.get()
+        with self._usage_lock:
+            for name in self.token_usage:
+                self.token_usage[name] += usage.get(name) or 0
+                if call_usage is not None:
+                    call_usage[name] = call_usage.get(name, 0) + (usage.get(name) or 0)
+    
+    def _generate_with_openai(self, prompt: Prompt, profile: GenerationProfile) -> str:
         """
         Génère une lettre de motivation en utilisant l'API OpenAI
         """
+        labels = (LLMProvider.OPENAI.value, profile.openai_model)
         try:
-            import openai
-            openai.api_key = os.environ.get("OPENAI_API_KEY", "")
+            with stage_timer("client_init", *labels):
+                openai = self.engine.openai_client
             
-            response = openai.ChatCompletion.create(
-                model="gpt-4",  # ou "gpt-3.5-turbo" pour un modèle moins coûteux
-                messages=[
-                    {"role": "system", "content": "Tu es un expert en rédaction de lettres de motivation professionnelles."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1500,
-                top_p=1.0,
-                frequency_penalty=0.0,
-                presence_penalty=0.0
-            )
-            return response.choices[0].message.content.strip()
+            with stage_timer("generation", *labels):
+                response = openai.ChatCompletion.create(**self._openai_request_params(prompt, profile))
+            with stage_timer("parse", *labels):
+                usage = response.get("usage") or {}
+                text = response.choices[0].message.content.strip()
+            self._record_usage({
+                "input_tokens": usage.get("prompt_tokens"),
+                "output_tokens": usage.get("completion_tokens"),
+                "cache_read_input_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+            })
+            observe_tokens(*labels, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+            return text
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Erreur lors de la génération avec OpenAI: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Erreur lors de la génération avec OpenAI: {str(e)}") from e
     
-    def _generate_with_aws_bedrock(self, prompt: str) -> str:
+    def _generate_with_aws_bedrock(self, prompt: Prompt, profile: GenerationProfile) -> str:
         """
         Génère une lettre de motivation en utilisant AWS Bedrock
         """
+        labels = (LLMProvider.AWS_BEDROCK.value, profile.bedrock_model_id)
         try:
-            # Récupération de la région AWS
-            region = os.environ.get("AWS_REGION", "us-east-1")
+            # Client Bedrock Runtime partagé (créé une seule fois par le moteur),
+            # à délai de lecture réduit si l'échéance de la requête est proche
+            with stage_timer("client_init", *labels):
+                bedrock_runtime = self.engine.bedrock_client_for(remaining_seconds())
             
-            # Initialisation du client Bedrock Runtime
-            bedrock_runtime = boto3.client(
-                service_name='bedrock-runtime',
-                region_name=region
-            )
+            # Appel au modèle (lecture complète de la réponse comprise)
+            with stage_timer("generation", *labels):
+                response = bedrock_runtime.invoke_model(
+                    modelId=profile.bedrock_model_id,
+                    contentType="application/json",
+                    accept="application/json",
+                    body=self._bedrock_request_body(prompt, profile)
+                )
+                raw_body = response.get('body').read()
             
-            # Format de requête pour Claude 3
-            body = json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 1500,
-                "top_k": 250,
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ]
-            })
+            # Traitement de la réponse
+            with stage_timer("parse", *labels):
+                response_body = json.loads(raw_body)
+                text = response_body.get('content')[0]['text'].strip()
+            usage = response_body.get('usage') or {}
+            self._record_usage(usage)
+            observe_tokens(*labels, usage.get('input_tokens'), usage.get('output_tokens'))
+            return text
             
-            # Appel au modèle
-            response = bedrock_runtime.invoke_model(
-                modelId="anthropic.claude-3-sonnet-20240229-v1:0",  # Updated model ID
+        except Exception as e:
+            logger.error("Génération AWS Bedrock impossible : %s", e)
+            raise HTTPException(status_code=500, detail=f"Erreur lors de la génération avec AWS Bedrock: {str(e)}") from e
+    
+    def _stream_with_openai(self, prompt: Prompt, profile: GenerationProfile) -> UpstreamStream:
+        """
+        Démarre une génération en flux avec l'API OpenAI et retourne l'itérateur
+        des fragments de texte (interrompu au fragment suivant en cas d'abandon)
+        """
+        try:
+            with stage_timer("client_init", LLMProvider.OPENAI.value, profile.openai_model):
+                openai = self.engine.openai_client
+            
+            response = openai.ChatCompletion.create(stream=True, **self._openai_request_params(prompt, profile))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erreur lors de la génération avec OpenAI: {str(e)}") from e
+        
+        def chunks():
+            for chunk in response:
+                text = chunk.choices[0].delta.get("content")
+                if text:
+                    yield text
+        return UpstreamStream(chunks())
+    
+    def _stream_with_aws_bedrock(self, prompt: Prompt, profile: GenerationProfile) -> UpstreamStream:
+        """
+        Démarre une génération en flux avec AWS Bedrock et retourne l'itérateur
+        des fragments de texte ; son abandon ferme la connexion HTTP amont
+        """
+        labels = (LLMProvider.AWS_BEDROCK.value, profile.bedrock_model_id)
+        try:
+            with stage_timer("client_init", *labels):
+                bedrock_runtime = self.engine.bedrock_client_for(remaining_seconds())
+            response = bedrock_runtime.invoke_model_with_response_stream(
+                modelId=profile.bedrock_model_id,
                 contentType="application/json",
                 accept="application/json",
-                body=body
+                body=self._bedrock_request_body(prompt, profile)
             )
-            
-            # Traitement de la réponse
-            response_body = json.loads(response.get('body').read())
-            return response_body.get('content')[0]['text'].strip()
-            
         except Exception as e:
-            # Add better error logging
-            print(f"AWS Bedrock Error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Erreur lors de la génération avec AWS Bedrock: {str(e)}")
+            logger.error("Ouverture du flux AWS Bedrock impossible : %s", e)
+            raise HTTPException(status_code=500, detail=f"Erreur lors de la génération avec AWS Bedrock: {str(e)}") from e
+        
+        event_stream = response.get('body')
+        
+        def chunks():
+            tokens = {}
+            try:
+                for event in event_stream:
+                    chunk = event.get('chunk')
+                    if not chunk:
+                        continue
+                    payload = json.loads(chunk['bytes'])
+                    if payload.get('type') == 'content_block_delta' and payload['delta'].get('type') == 'text_delta':
+                        yield payload['delta']['text']
+                    elif payload.get('type') == 'message_start':
+                        usage = payload['message'].get('usage') or {}
+                        self._record_usage(usage)
+                        tokens['input'] = usage.get('input_tokens')
+                    elif payload.get('type') == 'message_delta':
+                        usage = payload.get('usage') or {}
+                        self._record_usage(usage)
+                        tokens['output'] = usage.get('output_tokens')
+                observe_tokens(*labels, tokens.get('input'), tokens.get('output'))
+            finally:
+                # Ferme la connexion HTTP amont si le client abandonne le flux
+                event_stream.close()
+        return UpstreamStream(chunks(), abort=event_stream.close)
 
-# Initialisation du service LLM avec AWS Bedrock par défaut
-llm_service = LLMService(provider=LLMProvider.AWS_BEDROCK)
+    def _generate_with_local(self, prompt: Prompt, profile: GenerationProfile) -> str:
+        """
+        Fournisseur local de substitution : réponse déterministe, sans appel réseau
+        """
+        with stage_timer("generation", LLMProvider.LOCAL.value, LOCAL_MODEL):
+            return self._local_text(prompt, profile)
+    
+    def _local_text(self, prompt: Prompt, profile: GenerationProfile) -> str:
+        latency = float(os.environ.get("LOCAL_LLM_LATENCY_SECONDS", "0"))
+        if latency:
+            time.sleep(latency)
+        return f"[{LOCAL_MODEL}] " + " ".join(prompt.user.split())[:profile.max_tokens * 4]
+    
+    def _stream_with_local(self, prompt: Prompt, profile: GenerationProfile) -> UpstreamStream:
+        """
+        Version en flux du fournisseur local : la réponse est découpée en mots
+        """
+        words = self._local_text(prompt, profile).split(" ")
+        return UpstreamStream(word if index == 0 else " " + word for index, word in enumerate(words))
+
+# Initialisation du service LLM : AWS Bedrock par défaut, avec les fournisseurs
+# de secours éventuels listés dans LLM_PROVIDERS (ex: "aws_bedrock,openai")
+_configured_providers = [
+    LLMProvider(name.strip())
+    for name in os.environ.get("LLM_PROVIDERS", LLMProvider.AWS_BEDROCK.value).split(",")
+    if name.strip()
+]
+llm_service = LLMService(provider=_configured_providers[0], fallback_providers=_configured_providers[1:])
+
+# Tâches de génération asynchrones (async_mode)
+job_queue = JobQueue()
+
+# Réponses enregistrées par clé d'idempotence (en-tête Idempotency-Key)
+idempotency = IdempotencyManager()
 
 # Routes de l'API
 @app.get("/health")
@@ -268,35 +1236,398 @@ async def health_check():
     """
     return {"status": "ok", "message": "Le service est opérationnel"}
 
+@app.get("/stats")
+async def get_stats():
+    """
+    Retourne l'état du moteur de génération (appels en cours et en attente)
+    """
+    return {
+        "engine": llm_service.engine.stats(),
+        "cache": llm_service.cache.stats(),
+        "semantic_cache": llm_service.semantic_cache.stats(),
+        "digests": llm_service.digests.stats(),
+        "token_budget": llm_service.token_budget.stats(),
+        "abandoned": {
+            **abandoned.stats(),
+            "provider_calls_abandoned": llm_service.engine.abandoned,
+            "upstream_streams_closed": llm_service.engine.streams_aborted,
+        },
+        "coalescing": llm_service.single_flight.stats(),
+        "tokens": llm_service.token_usage,
+        "tiers": llm_service.tier_usage,
+        "routing": llm_service.router.stats(),
+        "admission": llm_service.admission.stats(),
+        "jobs": job_queue.stats(),
+        "idempotency": idempotency.stats()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Expose les histogrammes de durée par étape et de jetons au format Prometheus
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/profiles")
+async def get_profiles():
+    """
+    Liste les profils de génération disponibles
+    """
+    return {name: profile.model_dump() for name, profile in GENERATION_PROFILES.items()}
+
+async def _job_result(
+    generate: Callable[[], Awaitable[GenerationResult]],
+    to_response: Callable[[GenerationResult], BaseModel]
+) -> Dict[str, Any]:
+    """
+    Exécute une génération pour une tâche et retourne la réponse sérialisée
+    """
+    return to_response(await generate()).model_dump()
+
+async def _submit_job(kind: str, func: Callable[[], Awaitable[Dict[str, Any]]], callback_url: Optional[str]) -> JSONResponse:
+    """
+    Place une génération dans la file de tâches et répond 202 avec son identifiant
+    """
+    route = current_route.get()
+    
+    async def run() -> Dict[str, Any]:
+        # Les workers de la file sont partagés : la route d'origine est rétablie pour
+        # les métriques ; l'échéance de la requête HTTP ne s'applique pas à la tâche
+        current_route.set(route)
+        current_deadline.set(None)
+        return await func()
+    
+    try:
+        job = await job_queue.submit(kind, run, callback_url=callback_url)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    accepted = JobAcceptedResponse(job_id=job["id"], status=job["status"], status_url=f"/jobs/{job['id']}")
+    return JSONResponse(status_code=202, content=accepted.model_dump(), headers={"Location": accepted.status_url})
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """
+    Retourne le statut et, une fois terminée, le résultat d'une tâche
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Tâche inconnue ou expirée: {job_id}")
+    return JobStatusResponse(**public_job(job))
+
+async def _stored_response(handle: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+    """
+    Exécute le traitement d'une route et sérialise sa réponse pour l'enregistrer
+    sous la clé d'idempotence (statut, corps, en-têtes utiles)
+    """
+    response = await handle()
+    if isinstance(response, JSONResponse):
+        headers = {name: response.headers[name] for name in ("location", "retry-after") if name in response.headers}
+        return {"status_code": response.status_code, "body": json.loads(response.body), "headers": headers}
+    return {"status_code": 200, "body": jsonable_encoder(response), "headers": {}}
+
+async def _idempotent(key: Optional[str], request: BaseModel, handle: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Sans clé, exécute simplement le traitement. Avec une clé, une requête
+    répétée reçoit la réponse enregistrée ou attend celle en cours
+    (en-tête Idempotent-Replayed) ; les erreurs ne sont pas enregistrées et
+    la requête peut alors être retentée avec la même clé.
+    """
+    if not key:
+        return await handle()
+    # Une même clé sur deux routes désigne deux requêtes distinctes
+    scoped_key = f"{current_route.get()}:{key}"
+    try:
+        response, replayed = await idempotency.run(
+            scoped_key,
+            fingerprint(request.model_dump(mode="json")),
+            lambda: _stored_response(handle)
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "1"})
+    headers = dict(response["headers"])
+    if replayed:
+        headers["Idempotent-Replayed"] = "true"
+    return JSONResponse(status_code=response["status_code"], content=response["body"], headers=headers)
+
 @app.post("/generate-connection", response_model=ConnectionResponse)
-async def generate_connection(request: ConnectionRequest):
+async def generate_connection(
+    request: ConnectionRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
     """
     Génère un message de connexion personnalisé
     """
-    try:
-        message = llm_service.generate_connection_message(
+    return await _idempotent(idempotency_key, request, lambda: _connection_response(request))
+
+@app.post("/generate", response_model=GenerateResponse)
+async def generate_cover_letter(
+    request: GenerateRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    """
+    Génère une lettre de motivation à partir du profil utilisateur et de l'offre d'emploi
+    """
+    return await _idempotent(idempotency_key, request, lambda: _letter_response(request))
+
+async def _connection_response(request: ConnectionRequest) -> Union[ConnectionResponse, JSONResponse]:
+    """
+    Traitement de /generate-connection : génération directe ou tâche (async_mode)
+    """
+    async def generate() -> GenerationResult:
+        set_deadline(request.timeout_seconds)
+        return await llm_service.generate_connection_message(
             user=request.user,
             target=request.target,
-            common_points=request.common_points
+            common_points=request.common_points,
+            use_cache=not request.no_cache,
+            profile=request.profile,
+            variants=request.variants
+        )
+    
+    def to_response(result: GenerationResult) -> ConnectionResponse:
+        return ConnectionResponse(message=result.text, variants=result.variants, metadata=result.metadata)
+    
+    if request.async_mode:
+        return await _submit_job(
+            "connection",
+            lambda: _job_result(generate, to_response),
+            request.callback_url
         )
-        return ConnectionResponse(message=message)
+    try:
+        return to_response(await generate())
+    except HTTPException:
+        # Erreurs déjà qualifiées (saturation 429 avec Retry-After, erreur fournisseur)
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération du message: {str(e)}")
 
-@app.post("/generate", response_model=GenerateResponse)
-async def generate_cover_letter(request: GenerateRequest):
+async def _letter_response(request: GenerateRequest) -> Union[GenerateResponse, JSONResponse]:
     """
-    Génère une lettre de motivation à partir du profil utilisateur et de l'offre d'emploi
+    Traitement de /generate : génération directe ou tâche (async_mode)
     """
+    async def generate() -> GenerationResult:
+        set_deadline(request.timeout_seconds)
+        return await llm_service.generate_letter(
+            request.user,
+            request.job,
+            use_cache=not request.no_cache,
+            profile=request.profile
+        )
+    
+    if request.async_mode:
+        return await _submit_job(
+            "letter",
+            lambda: _job_result(generate, lambda result: GenerateResponse(letter=result.text, metadata=result.metadata)),
+            request.callback_url
+        )
     try:
         # Génération de la lettre
-        letter = llm_service.generate_letter(request.user, request.job)
+        result = await generate()
         
         # Retour de la réponse
-        return GenerateResponse(letter=letter)
+        return GenerateResponse(letter=result.text, metadata=result.metadata)
+    except HTTPException:
+        # Erreurs déjà qualifiées (saturation 429 avec Retry-After, erreur fournisseur)
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la génération de la lettre: {str(e)}")
+
+def _sse_event(data: Dict, event: Optional[str] = None) -> str:
+    """
+    Formate un événement Server-Sent Events
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _sse_response(
+    open_stream: Callable[[Callable[[GenerationMetadata], None]], AsyncIterator[str]]
+) -> StreamingResponse:
+    """
+    Relaie un flux de génération au client sous forme d'événements SSE ;
+    l'événement final décrit le fournisseur et le niveau qui ont servi le flux
+    """
+    served: List[GenerationMetadata] = []
+    chunks = open_stream(served.append)
+    # Le premier fragment est attendu avant l'envoi des en-têtes : une erreur
+    # du fournisseur à l'ouverture du flux donne encore une réponse HTTP d'erreur
+    try:
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = None
+    
+    async def events():
+        try:
+            if first_chunk is not None:
+                yield _sse_event({"text": first_chunk})
+            async for chunk in chunks:
+                yield _sse_event({"text": chunk})
+            yield _sse_event(served[-1].model_dump(exclude={"cached"}), event="done")
+        except Exception as e:
+            yield _sse_event({"detail": getattr(e, "detail", str(e))}, event="error")
+        finally:
+            await chunks.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/generate-connection/stream")
+async def stream_connection(request: ConnectionRequest):
+    """
+    Génère un message de connexion personnalisé en flux (Server-Sent Events)
+    """
+    if request.variants > 1:
+        raise HTTPException(status_code=400, detail="Les versions multiples ne sont pas disponibles en flux")
+    set_deadline(request.timeout_seconds)
+    try:
+        profile = request.profile or "connection_message"
+        return await _sse_response(
+            lambda on_start: llm_service.stream_connection_message(
+                user=request.user,
+                target=request.target,
+                common_points=request.common_points,
+                use_cache=not request.no_cache,
+                profile=profile,
+                on_start=on_start
+            )
+        )
+    except HTTPException:
+        # Erreurs déjà qualifiées (saturation 429 avec Retry-After, erreur fournisseur)
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la génération du message: {str(e)}")
+
+@app.post("/generate/stream")
+async def stream_cover_letter(request: GenerateRequest):
+    """
+    Génère une lettre de motivation en flux (Server-Sent Events)
+    """
+    set_deadline(request.timeout_seconds)
+    try:
+        profile = request.profile or "cover_letter"
+        return await _sse_response(
+            lambda on_start: llm_service.stream_letter(
+                request.user,
+                request.job,
+                use_cache=not request.no_cache,
+                profile=profile,
+                on_start=on_start
+            )
+        )
+    except HTTPException:
+        # Erreurs déjà qualifiées (saturation 429 avec Retry-After, erreur fournisseur)
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération de la lettre: {str(e)}")
 
+async def _run_batch(
+    items: List[Any],
+    worker: Callable[[Any], Awaitable[GenerationResult]],
+    max_concurrency: int
+) -> AsyncIterator[Tuple[int, Optional[GenerationResult], Optional[str]]]:
+    """
+    Exécute les éléments d'un lot en parallèle (dans la limite max_concurrency)
+    et produit (index, résultat, erreur) dans l'ordre d'achèvement.
+    Une erreur sur un élément n'interrompt pas le reste du lot.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run_item(index: int, item: Any):
+        async with semaphore:
+            try:
+                return index, await worker(item), None
+            except Exception as e:
+                return index, None, str(getattr(e, "detail", e))
+    
+    tasks = [asyncio.create_task(run_item(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Annule les éléments restants si le client abandonne le lot
+        for task in tasks:
+            task.cancel()
+
+async def _ndjson_results(
+    results: AsyncIterator[Tuple[int, Optional[GenerationResult], Optional[str]]],
+    field: str
+) -> AsyncIterator[str]:
+    """
+    Formate les résultats d'un lot en NDJSON (une ligne JSON par élément)
+    """
+    async for index, result, error in results:
+        line = {
+            "index": index,
+            field: result.text if result else None,
+            "metadata": result.metadata.model_dump() if result else None,
+            "error": error
+        }
+        if result and result.variants:
+            line["variants"] = result.variants
+        yield json.dumps(line, ensure_ascii=False) + "\n"
+
+@app.post("/generate-connection/batch", response_model=BatchConnectionResponse)
+async def generate_connection_batch(request: BatchConnectionRequest):
+    """
+    Génère des messages de connexion pour un lot de demandes
+    """
+    async def worker(item: ConnectionRequest) -> GenerationResult:
+        set_deadline(item.timeout_seconds)
+        return await llm_service.generate_connection_message(
+            user=item.user,
+            target=item.target,
+            common_points=item.common_points,
+            use_cache=not item.no_cache,
+            profile=item.profile,
+            variants=item.variants
+        )
+    
+    results = _run_batch(request.items, worker, request.max_concurrency)
+    if request.stream:
+        return StreamingResponse(_ndjson_results(results, "message"), media_type="application/x-ndjson")
+    
+    items = sorted([
+        BatchConnectionItem(
+            index=index,
+            message=result.text if result else None,
+            variants=result.variants if result else None,
+            metadata=result.metadata if result else None,
+            error=error
+        )
+        async for index, result, error in results
+    ], key=lambda item: item.index)
+    failed = sum(1 for item in items if item.error)
+    return BatchConnectionResponse(results=items, succeeded=len(items) - failed, failed=failed)
+
+@app.post("/generate/batch", response_model=BatchGenerateResponse)
+async def generate_cover_letter_batch(request: BatchGenerateRequest):
+    """
+    Génère des lettres de motivation pour un lot de demandes
+    """
+    async def worker(item: GenerateRequest) -> GenerationResult:
+        set_deadline(item.timeout_seconds)
+        return await llm_service.generate_letter(item.user, item.job, use_cache=not item.no_cache, profile=item.profile)
+    
+    results = _run_batch(request.items, worker, request.max_concurrency)
+    if request.stream:
+        return StreamingResponse(_ndjson_results(results, "letter"), media_type="application/x-ndjson")
+    
+    items = sorted([
+        BatchGenerateItem(
+            index=index,
+            letter=result.text if result else None,
+            metadata=result.metadata if result else None,
+            error=error
+        )
+        async for index, result, error in results
+    ], key=lambda item: item.index)
+    failed = sum(1 for item in items if item.error)
+    return BatchGenerateResponse(results=items, succeeded=len(items) - failed, failed=failed)
+
 # Point d'entrée pour l'exécution directe
 if __name__ == "__main__":
     import uvicorn
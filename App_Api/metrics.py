@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Métriques au format Prometheus
+Histogrammes des durées par étape de génération et des jetons consommés,
+étiquetés par route, fournisseur et modèle, exposés sur /metrics
+"""
+
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Route (gabarit de chemin) de la requête HTTP en cours, renseignée par le middleware
+current_route: contextvars.ContextVar[str] = contextvars.ContextVar("current_route", default="")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+TOKEN_BUCKETS = (10, 50, 100, 200, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """
+    Histogramme cumulatif à intervalles fixes, une série par combinaison d'étiquettes
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Par série : (compteurs par intervalle, somme, nombre)
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in sorted(self._series.items())]
+        for key, counts, total, count in snapshot:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                separator = "," if labels else ""
+                lines.append(f'{self.name}_bucket{{{labels}{separator}le="{_format_value(bound)}"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+# Durée des étapes d'une génération : construction du prompt, attente
+# d'admission, attente d'un thread, création du client, appel au modèle,
+# décodage de la réponse
+STAGE_DURATION = Histogram(
+    "llm_stage_duration_seconds",
+    "Durée des étapes de génération",
+    ("route", "provider", "model", "stage"),
+    DURATION_BUCKETS,
+)
+TOKENS = Histogram(
+    "llm_tokens",
+    "Jetons consommés par appel au fournisseur",
+    ("route", "provider", "model", "direction"),
+    TOKEN_BUCKETS,
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Durée totale des requêtes HTTP",
+    ("route", "method", "status"),
+    DURATION_BUCKETS,
+)
+
+# Appels par niveau de modèle (rapide ou grand), bascules comprises
+TIER_CALL_DURATION = Histogram(
+    "llm_tier_call_duration_seconds",
+    "Durée des appels au fournisseur par niveau de modèle",
+    ("route", "tier"),
+    DURATION_BUCKETS,
+)
+TIER_TOKENS = Histogram(
+    "llm_tier_tokens",
+    "Jetons consommés par appel, par niveau de modèle",
+    ("route", "tier", "direction"),
+    TOKEN_BUCKETS,
+)
+
+REGISTRY = (STAGE_DURATION, TOKENS, HTTP_REQUEST_DURATION, TIER_CALL_DURATION, TIER_TOKENS)
+
+
+def observe_stage(stage: str, seconds: float, provider: str = "", model: str = ""):
+    """
+    Enregistre la durée d'une étape pour la route en cours. Les étapes
+    antérieures au choix du fournisseur n'ont pas d'étiquette provider/model.
+    """
+    STAGE_DURATION.observe(seconds, route=current_route.get(), provider=provider, model=model, stage=stage)
+
+
+@contextmanager
+def stage_timer(stage: str, provider: str = "", model: str = "") -> Iterator[None]:
+    """
+    Mesure la durée du bloc comme une étape de génération
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started, provider, model)
+
+
+def observe_tokens(provider: str, model: str, input_tokens: Optional[int], output_tokens: Optional[int]):
+    """
+    Enregistre les jetons d'entrée et de sortie d'un appel
+    """
+    route = current_route.get()
+    if input_tokens is not None:
+        TOKENS.observe(input_tokens, route=route, provider=provider, model=model, direction="input")
+    if output_tokens is not None:
+        TOKENS.observe(output_tokens, route=route, provider=provider, model=model, direction="output")
+
+
+def observe_tier_call(tier: str, seconds: float, input_tokens: Optional[int], output_tokens: Optional[int]):
+    """
+    Enregistre la durée et les jetons d'un appel pour un niveau de modèle
+    """
+    route = current_route.get()
+    TIER_CALL_DURATION.observe(seconds, route=route, tier=tier)
+    if input_tokens is not None:
+        TIER_TOKENS.observe(input_tokens, route=route, tier=tier, direction="input")
+    if output_tokens is not None:
+        TIER_TOKENS.observe(output_tokens, route=route, tier=tier, direction="output")
+
+
+def render_metrics() -> str:
+    """
+    Retourne toutes les métriques au format texte de Prometheus
+    """
+    lines: List[str] = []
+    for histogram in REGISTRY:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+class RouteMetricsMiddleware:
+    """
+    Middleware ASGI : renseigne la route en cours (gabarit de chemin, pour
+    borner la cardinalité) et mesure la durée totale de chaque requête
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    def _route_for(self, scope) -> str:
+        from starlette.routing import Match
+
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "")
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route_for(scope)
+        token = current_route.set(route)
+        status = {"code": 500}
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except asyncio.CancelledError:
+            # Requête abandonnée par le client (convention 499)
+            status["code"] = 499
+            raise
+        finally:
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                route=route,
+                method=scope["method"],
+                status=str(status["code"])
+            )
+            current_route.reset(token)
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Routage des appels entre fournisseurs LLM
+Suit la latence et le taux d'erreur de chaque fournisseur, envoie chaque appel
+au plus rapide des fournisseurs sains, bascule en cas d'erreur et peut lancer
+une requête de couverture (hedging) lorsque le premier appel tarde. Les
+fournisseurs de dernier recours (ex: le bouchon local) ne sont utilisés
+qu'après l'échec de tous les autres.
+"""
+
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from deadlines import DeadlineExceeded
+
+
+class ProviderStats:
+    """
+    Fenêtre glissante des latences et des résultats d'un fournisseur
+    """
+
+    def __init__(self, window: int):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """
+        Retourne le percentile des latences observées (None sans mesure)
+        """
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = int(round(pct / 100 * (len(ordered) - 1)))
+        return ordered[index]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class ProviderRouter:
+    """
+    Choisit le fournisseur de chaque appel selon les latences observées.
+
+    Un fournisseur qui échoue plusieurs fois de suite est écarté pendant une
+    période de refroidissement, puis réessayé. L'appel suivant bascule sur le
+    fournisseur suivant en cas d'erreur. Le classement tient compte du taux
+    d'erreur (latence attendue jusqu'à une réponse valide), et un fournisseur
+    relégué reçoit un appel de sonde toutes les probe_interval secondes pour
+    que ses mesures se renouvellent. Les fournisseurs de dernier recours
+    restent en fin de classement et ne servent jamais de couverture.
+    """
+
+    def __init__(
+        self,
+        providers: List[str],
+        window: Optional[int] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: int = 20,
+        max_consecutive_failures: int = 3,
+        cooldown_seconds: Optional[float] = None,
+        last_resort: Iterable[str] = (),
+        probe_interval: Optional[float] = None,
+    ):
+        if not providers:
+            raise ValueError("Au moins un fournisseur LLM doit être configuré")
+        self.providers = list(providers)
+        self.window = window or int(os.environ.get("LLM_ROUTER_WINDOW", "100"))
+        hedge_env = os.environ.get("LLM_HEDGE_PERCENTILE")
+        self.hedge_percentile = hedge_percentile if hedge_percentile is not None else (float(hedge_env) if hedge_env else None)
+        self.hedge_min_samples = hedge_min_samples
+        self.max_consecutive_failures = max_consecutive_failures
+        self.cooldown_seconds = cooldown_seconds if cooldown_seconds is not None else float(
+            os.environ.get("LLM_ROUTER_COOLDOWN_SECONDS", "30")
+        )
+        self.last_resort = [name for name in last_resort if name in self.providers]
+        self.probe_interval = probe_interval if probe_interval is not None else float(
+            os.environ.get("LLM_ROUTER_PROBE_INTERVAL_SECONDS", "60")
+        )
+        self._stats: Dict[str, ProviderStats] = {name: ProviderStats(self.window) for name in self.providers}
+        # Dernier appel envoyé à chaque fournisseur (horloge monotone)
+        self._last_attempt: Dict[str, float] = {name: time.monotonic() for name in self.providers}
+
+        # Compteurs exposés par stats()
+        self.failovers = 0
+        self.probes = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def _is_healthy(self, name: str, now: float) -> bool:
+        return self._stats[name].unhealthy_until <= now
+
+    def ranked(self) -> List[str]:
+        """
+        Retourne les fournisseurs du plus au moins favorable : sains d'abord,
+        puis par latence médiane corrigée du taux d'erreur, les fournisseurs de
+        dernier recours à la fin. Un fournisseur sans mesure garde sa place
+        dans l'ordre de configuration, après ceux déjà mesurés.
+        """
+        now = time.monotonic()
+
+        def sort_key(item: Tuple[int, str]):
+            index, name = item
+            stats = self._stats[name]
+            p50 = stats.percentile(50)
+            # Latence attendue jusqu'à une réponse valide (nouvel essai après chaque échec)
+            expected = (p50 or 0.0) / max(1.0 - stats.error_rate, 0.05)
+            return (name in self.last_resort, not self._is_healthy(name, now), p50 is None, expected, index)
+
+        return [name for _, name in sorted(enumerate(self.providers), key=sort_key)]
+
+    async def call(self, func: Callable[[str], Awaitable[Any]]) -> Tuple[str, Any]:
+        """
+        Exécute func(fournisseur) sur le meilleur fournisseur, en basculant sur
+        les suivants en cas d'erreur. Retourne (fournisseur, résultat).
+        """
+        order = self._with_probe(self.ranked())
+        last_error: Optional[BaseException] = None
+        position = 0
+        while position < len(order):
+            if position > 0:
+                self.failovers += 1
+            primary = order[position]
+            secondary = order[position + 1] if position + 1 < len(order) else None
+            if secondary in self.last_resort or primary in self.last_resort:
+                secondary = None
+            hedge_delay = self._hedge_delay(primary) if secondary else None
+            try:
+                if hedge_delay is not None:
+                    position += 2
+                    return await self._hedged(primary, secondary, hedge_delay, func)
+                position += 1
+                return primary, await self._timed(primary, func)
+            except DeadlineExceeded:
+                # Échéance de la requête passée : inutile de basculer
+                raise
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+    def _with_probe(self, order: List[str]) -> List[str]:
+        """
+        Place en tête un fournisseur sain relégué qui n'a pas été appelé depuis
+        probe_interval secondes (appel de sonde), pour renouveler ses mesures
+        """
+        now = time.monotonic()
+        for name in order[1:]:
+            if name in self.last_resort or not self._is_healthy(name, now):
+                continue
+            if now - self._last_attempt[name] >= self.probe_interval:
+                self.probes += 1
+                return [name] + [other for other in order if other != name]
+        return order
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        """
+        Délai après lequel une requête de couverture est lancée (None si désactivé)
+        """
+        stats = self._stats[name]
+        if self.hedge_percentile is None or len(stats.latencies) < self.hedge_min_samples:
+            return None
+        return stats.percentile(self.hedge_percentile)
+
+    async def _timed(self, name: str, func: Callable[[str], Awaitable[Any]]) -> Any:
+        started = time.monotonic()
+        self._last_attempt[name] = started
+        try:
+            result = await func(name)
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # Appel annulé (requête de couverture perdante, échéance) : aucune mesure
+            raise
+        except Exception:
+            stats = self._stats[name]
+            stats.record_failure()
+            if stats.consecutive_failures >= self.max_consecutive_failures:
+                stats.unhealthy_until = time.monotonic() + self.cooldown_seconds
+            raise
+        self._stats[name].record_success(time.monotonic() - started)
+        return result
+
+    async def _hedged(
+        self,
+        primary: str,
+        secondary: str,
+        delay: float,
+        func: Callable[[str], Awaitable[Any]]
+    ) -> Tuple[str, Any]:
+        """
+        Lance l'appel principal, puis un second appel sur un autre fournisseur
+        s'il n'a pas répondu après `delay` secondes. Le premier résultat valide
+        l'emporte et l'autre appel est annulé.
+        """
+        tasks = {asyncio.ensure_future(self._timed(primary, func)): primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedged += 1
+                tasks[asyncio.ensure_future(self._timed(secondary, func))] = secondary
+            elif next(iter(done)).exception() is not None:
+                # Échec rapide de l'appel principal : bascule immédiate
+                self.failovers += 1
+                tasks[asyncio.ensure_future(self._timed(secondary, func))] = secondary
+
+            pending = set(tasks)
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] == secondary:
+                            self.hedge_wins += 1
+                        return tasks[task], task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retourne latences (p50/p95), taux d'erreur et état de chaque fournisseur
+        """
+        now = time.monotonic()
+        return {
+            "providers": {
+                name: {
+                    "samples": len(stats.latencies),
+                    "p50_seconds": stats.percentile(50),
+                    "p95_seconds": stats.percentile(95),
+                    "error_rate": round(stats.error_rate, 4),
+                    "healthy": self._is_healthy(name, now),
+                    "last_resort": name in self.last_resort,
+                }
+                for name, stats in self._stats.items()
+            },
+            "order": self.ranked(),
+            "failovers": self.failovers,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "probes": self.probes,
+        }
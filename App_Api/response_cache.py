@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Cache des réponses LLM
+Cache à deux niveaux : LRU en mémoire avec durée de vie, et stockage SQLite
+optionnel qui survit aux redémarrages. Les écritures sur disque sont confiées
+à un thread dédié et les lectures asynchrones s'exécutent hors de la boucle
+d'événements.
+"""
+
+import os
+import json
+import logging
+import time
+import queue
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Cache des textes générés, indexé par une empreinte normalisée de la requête
+    (prompt, fournisseur, modèle et paramètres d'échantillonnage).
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        db_path: Optional[str] = None,
+    ):
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "512"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.environ.get("LLM_CACHE_TTL_SECONDS", "3600"))
+        # Chaîne vide : pas de stockage sur disque, même si LLM_CACHE_DB_PATH est défini
+        self.db_path = db_path if db_path is not None else os.environ.get("LLM_CACHE_DB_PATH")
+
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # _lock protège le LRU et les compteurs, _db_lock la connexion SQLite :
+        # une écriture sur disque ne bloque jamais la boucle d'événements
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if self.db_path:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+        # Écritures sur disque : un seul thread, un commit par lot d'écritures en attente
+        self._writes: "queue.Queue[Optional[Tuple[str, str, float]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        if self._db is not None:
+            self._writer = threading.Thread(target=self._write_loop, name="llm-cache-writer", daemon=True)
+            self._writer.start()
+
+        # Compteurs exposés par stats()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.write_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._db is not None
+
+    @staticmethod
+    def make_key(prompt: str, provider: str, model: str, params: Dict[str, Any]) -> str:
+        """
+        Calcule l'empreinte d'une requête. Les espaces du prompt sont normalisés
+        pour que des variations de mise en forme donnent la même clé.
+        """
+        payload = json.dumps(
+            {
+                "prompt": " ".join(prompt.split()),
+                "provider": provider,
+                "model": model,
+                "params": params,
+            },
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Retourne la valeur en cache, d'abord en mémoire puis sur disque
+        """
+        found = self.lookup([key])
+        return found[1] if found is not None else None
+
+    def lookup(self, keys: Sequence[str]) -> Optional[Tuple[str, str]]:
+        """
+        Retourne (clé, valeur) de la première clé présente dans le cache,
+        d'abord en mémoire puis sur disque
+        """
+        now = time.time()
+        found = self._memory_lookup(keys, now)
+        if found is None and self._db is not None:
+            found = self._disk_lookup(keys, now)
+        return self._counted(found)
+
+    async def lookup_async(self, keys: Sequence[str]) -> Optional[Tuple[str, str]]:
+        """
+        Variante de lookup pour la boucle d'événements : la lecture sur disque
+        s'exécute dans un thread
+        """
+        now = time.time()
+        found = self._memory_lookup(keys, now)
+        if found is None and self._db is not None:
+            found = await asyncio.to_thread(self._disk_lookup, keys, now)
+        return self._counted(found)
+
+    def _memory_lookup(self, keys: Sequence[str], now: float) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return key, value
+                del self._entries[key]
+        return None
+
+    def _disk_lookup(self, keys: Sequence[str], now: float) -> Optional[Tuple[str, str]]:
+        placeholders = ",".join("?" * len(keys))
+        with self._db_lock:
+            if self._db is None:
+                return None
+            rows = {
+                key: (value, expires_at)
+                for key, value, expires_at in self._db.execute(
+                    f"SELECT key, value, expires_at FROM llm_cache WHERE key IN ({placeholders})", list(keys)
+                )
+            }
+            expired = [key for key, (_, expires_at) in rows.items() if expires_at <= now]
+            if expired:
+                self._db.executemany("DELETE FROM llm_cache WHERE key = ?", [(key,) for key in expired])
+                self._db.commit()
+        for key in keys:
+            if key in rows and key not in expired:
+                value, expires_at = rows[key]
+                with self._lock:
+                    self._remember(key, value, expires_at)
+                    self.disk_hits += 1
+                return key, value
+        return None
+
+    def _counted(self, found: Optional[Tuple[str, str]]) -> Optional[Tuple[str, str]]:
+        if found is None:
+            with self._lock:
+                self.misses += 1
+        return found
+
+    def set(self, key: str, value: str):
+        """
+        Enregistre une valeur en mémoire, et la transmet au thread d'écriture
+        sur disque
+        """
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self._writer is not None:
+            self._writes.put((key, value, expires_at))
+
+    def _write_loop(self):
+        while True:
+            item = self._writes.get()
+            batch: List[Tuple[str, str, float]] = []
+            stop = item is None
+            if not stop:
+                batch.append(item)
+            # Les écritures arrivées entre-temps partagent le même commit
+            while not stop:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._persist(batch)
+            if stop:
+                return
+
+    def _persist(self, batch: List[Tuple[str, str, float]]):
+        # Une écriture en échec est perdue, mais le thread continue de servir les suivantes
+        with self._db_lock:
+            if self._db is None:
+                return
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    batch
+                )
+                self._db.commit()
+                return
+            except Exception:
+                logger.exception("Écriture du cache sur disque impossible (%d entrées)", len(batch))
+                try:
+                    self._db.rollback()
+                except Exception:
+                    pass
+        with self._lock:
+            self.write_errors += 1
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs de succès et d'échecs du cache
+        """
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_enabled": self._db is not None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "write_errors": self.write_errors,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        """
+        Termine les écritures en attente et ferme la base SQLite
+        """
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Cache sémantique des messages de connexion
+Retrouve un message déjà généré pour une demande quasi identique (même
+expéditeur, même profil de cible à un nom près) et le repersonnalise avec le
+nom de la nouvelle cible. Vectorisation locale par hachage, sans dépendance.
+"""
+
+import os
+import re
+import math
+import zlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+# Marqueurs substitués au nom de la cible dans les messages conservés
+TARGET_NAME_PLACEHOLDER = "{{target_name}}"
+TARGET_FIRST_NAME_PLACEHOLDER = "{{target_first_name}}"
+
+SparseVector = Dict[int, float]
+
+# Dimension fictive sous laquelle sont indexés les segments vides
+EMPTY_SEGMENT = -1
+
+
+def vectorize(text: str, dimensions: int) -> SparseVector:
+    """
+    Projette un texte dans un espace de dimension fixe (hachage des mots,
+    des paires de mots et des trigrammes de caractères), puis le normalise
+    """
+    tokens = re.findall(r"\w+", text.lower())
+    joined = " ".join(tokens)
+    features = [("w", 1.0, token) for token in tokens]
+    features += [("b", 1.0, f"{first} {second}") for first, second in zip(tokens, tokens[1:])]
+    features += [("c", 0.5, joined[index:index + 3]) for index in range(len(joined) - 2)]
+
+    vector: SparseVector = {}
+    for kind, weight, feature in features:
+        digest = zlib.crc32(f"{kind}:{feature}".encode("utf-8"))
+        # Le bit de poids fort donne le signe : limite le biais des collisions
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        index = digest % dimensions
+        vector[index] = vector.get(index, 0.0) + sign * weight
+
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    if not norm:
+        return {}
+    return {index: value / norm for index, value in vector.items() if value}
+
+
+def cosine(first: SparseVector, second: SparseVector) -> float:
+    """
+    Similarité cosinus de deux vecteurs normalisés (deux textes vides sont identiques)
+    """
+    if not first or not second:
+        return 1.0 if first == second else 0.0
+    if len(first) > len(second):
+        first, second = second, first
+    return sum(value * second.get(index, 0.0) for index, value in first.items())
+
+
+def signature(vector: SparseVector, threshold: float) -> List[int]:
+    """
+    Dimensions de plus fort poids d'un vecteur normalisé, jusqu'à ce que la
+    norme du reste passe sous le seuil : un vecteur de similarité au moins
+    égale au seuil partage forcément l'une d'elles (filtrage par préfixe)
+    """
+    if not vector:
+        return [EMPTY_SEGMENT]
+    remaining = 1.0
+    dimensions = []
+    for index, value in sorted(vector.items(), key=lambda item: -abs(item[1])):
+        if math.sqrt(max(remaining, 0.0)) < threshold:
+            break
+        dimensions.append(index)
+        remaining -= value * value
+    return dimensions
+
+
+def _first_name(name: str) -> str:
+    return name.split()[0] if name.split() else name
+
+
+def depersonalize(message: str, target_name: str) -> str:
+    """
+    Remplace le nom (complet puis prénom) de la cible par des marqueurs
+    """
+    message = message.replace(target_name, TARGET_NAME_PLACEHOLDER)
+    first_name = _first_name(target_name)
+    if first_name and first_name != target_name:
+        message = re.sub(rf"\b{re.escape(first_name)}\b", TARGET_FIRST_NAME_PLACEHOLDER, message)
+    return message
+
+
+def personalize(template: str, target_name: str) -> str:
+    """
+    Réinsère le nom de la nouvelle cible à la place des marqueurs
+    """
+    return template.replace(TARGET_NAME_PLACEHOLDER, target_name).replace(
+        TARGET_FIRST_NAME_PLACEHOLDER, _first_name(target_name)
+    )
+
+
+class SemanticCache:
+    """
+    Index borné (LRU) de messages indexés par les vecteurs de leur demande,
+    partitionné par portée (profil, fournisseur, modèle). Une demande est
+    décrite par plusieurs segments (expéditeur, cible, points communs) : la
+    similarité retenue est la plus faible des segments, pour qu'un expéditeur
+    identique ne masque pas une cible différente. Une recherche renvoie le
+    message du plus proche voisin au-delà du seuil de similarité.
+
+    Un index inversé (portée, segment, dimension) limite la recherche aux
+    entrées qui partagent, pour chaque segment, une dimension de la signature
+    de l'entrée : les autres ne peuvent pas atteindre le seuil.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        max_entries: Optional[int] = None,
+        threshold: Optional[float] = None,
+        dimensions: int = 4096,
+    ):
+        self.enabled = enabled if enabled is not None else os.environ.get("LLM_SEMANTIC_CACHE", "").lower() in ("1", "true", "yes")
+        self.max_entries = max_entries or int(os.environ.get("LLM_SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+        self.threshold = threshold or float(os.environ.get("LLM_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        self.dimensions = dimensions
+
+        # Entrée : (portée, vecteurs des segments, message dépersonnalisé)
+        self._entries: "OrderedDict[int, Tuple[str, Tuple[SparseVector, ...], str]]" = OrderedDict()
+        # Index inversé : (portée, segment, dimension) -> entrées dont la signature la contient
+        self._index: Dict[Tuple[str, int, int], Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        # Compteurs exposés par stats()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_hit_similarity = 0.0
+
+    def _vectorize(self, segments: Sequence[str]) -> Tuple[SparseVector, ...]:
+        return tuple(vectorize(segment, self.dimensions) for segment in segments)
+
+    def _keys(self, scope: str, vectors: Tuple[SparseVector, ...]) -> List[Tuple[str, int, int]]:
+        return [
+            (scope, position, index)
+            for position, vector in enumerate(vectors)
+            for index in signature(vector, self.threshold)
+        ]
+
+    def _candidates(self, scope: str, vectors: Tuple[SparseVector, ...]) -> Set[int]:
+        """
+        Entrées qui partagent une dimension de leur signature avec chaque segment
+        """
+        candidates: Optional[Set[int]] = None
+        for position, vector in enumerate(vectors):
+            dimensions = vector.keys() if vector else (EMPTY_SEGMENT,)
+            matches: Set[int] = set()
+            for index in dimensions:
+                matches.update(self._index.get((scope, position, index), ()))
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                return set()
+        return candidates or set()
+
+    def _similarity(self, vectors: Tuple[SparseVector, ...], entry_vectors: Tuple[SparseVector, ...], floor: float) -> Optional[float]:
+        """
+        Plus faible similarité des segments, ou None dès qu'un segment est sous floor
+        """
+        similarity = 1.0
+        for vector, entry_vector in zip(vectors, entry_vectors):
+            similarity = min(similarity, cosine(vector, entry_vector))
+            if similarity < floor:
+                return None
+        return similarity
+
+    def lookup(self, scope: str, segments: Sequence[str], target_name: str) -> Optional[str]:
+        """
+        Retourne le message repersonnalisé du plus proche voisin, ou None
+        """
+        vectors = self._vectorize(segments)
+        with self._lock:
+            best_id, best_similarity = None, self.threshold
+            for entry_id in self._candidates(scope, vectors):
+                _, entry_vectors, _ = self._entries[entry_id]
+                if len(entry_vectors) != len(vectors):
+                    continue
+                similarity = self._similarity(vectors, entry_vectors, best_similarity)
+                if similarity is not None:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            self.total_hit_similarity += best_similarity
+            template = self._entries[best_id][2]
+        return personalize(template, target_name)
+
+    def add(self, scope: str, segments: Sequence[str], target_name: str, message: str):
+        """
+        Indexe un message généré pour une demande
+        """
+        vectors = self._vectorize(segments)
+        keys = self._keys(scope, vectors)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (scope, vectors, depersonalize(message, target_name))
+            for key in keys:
+                self._index.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                evicted_id, (evicted_scope, evicted_vectors, _) = self._entries.popitem(last=False)
+                self._unindex(evicted_id, self._keys(evicted_scope, evicted_vectors))
+                self.evictions += 1
+
+    def _unindex(self, entry_id: int, keys: List[Tuple[str, int, int]]):
+        for key in keys:
+            entries = self._index.get(key)
+            if entries is not None:
+                entries.discard(entry_id)
+                if not entries:
+                    del self._index[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retourne la taille de l'index et le taux de succès
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "avg_hit_similarity": round(self.total_hit_similarity / self.hits, 4) if self.hits else None,
+        }
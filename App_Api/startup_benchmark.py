@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Mesure du temps de démarrage à froid de l'API
+Lance plusieurs interpréteurs neufs et mesure pour chacun l'import de main,
+la première requête (/health) et la création du client Bedrock. Les modules
+les plus coûteux à importer sont relevés avec `python -X importtime`.
+Les résultats sont enregistrés en JSON pour suivre leur évolution.
+
+Utilisation :
+    python startup_benchmark.py --runs 10 --output startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Exécuté dans chaque interpréteur neuf
+PROBE = r"""
+import json, time, asyncio
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def first_request():
+    messages = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        messages.append(message)
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/health", "raw_path": b"/health", "root_path": "", "query_string": b"",
+        "headers": [], "server": ("benchmark", 80), "client": ("benchmark", 0),
+    }
+    await main.app(scope, receive, send)
+    return messages[0]["status"]
+
+status = asyncio.run(first_request())
+responded = time.perf_counter()
+main.llm_service.engine.bedrock_client
+client_ready = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - started,
+    "first_request_seconds": responded - imported,
+    "bedrock_client_seconds": client_ready - responded,
+    "status": status,
+}))
+"""
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "min": round(ordered[0], 4),
+        "median": round(ordered[len(ordered) // 2], 4),
+        "p90": round(ordered[int(round(0.9 * (len(ordered) - 1)))], 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def _environment(serverless: bool) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("AWS_REGION", "us-east-1")
+    if serverless:
+        env["LLM_SERVERLESS"] = "1"
+    return env
+
+
+def measure(runs: int, serverless: bool) -> Dict:
+    """
+    Mesure `runs` démarrages à froid dans des interpréteurs séparés
+    """
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", PROBE],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=_environment(serverless),
+            text=True
+        )
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "serverless": serverless,
+        "runs": runs,
+        **{
+            name: _summary([sample[name] for sample in samples])
+            for name in ("import_seconds", "first_request_seconds", "bedrock_client_seconds")
+        },
+    }
+
+
+def slowest_imports(limit: int, serverless: bool) -> List[Dict]:
+    """
+    Modules dont l'import (cumulé) est le plus long, d'après python -X importtime
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=_environment(serverless),
+        capture_output=True,
+        text=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        modules.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(modules, key=lambda module: module["cumulative_ms"], reverse=True)[:limit]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure du temps de démarrage de l'API")
+    parser.add_argument("--runs", type=int, default=10, help="Nombre de démarrages mesurés par mode")
+    parser.add_argument("--top", type=int, default=15, help="Nombre de modules les plus lents à relever")
+    parser.add_argument("--output", default=f"startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    args = parser.parse_args()
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "modes": [],
+        "slowest_imports": slowest_imports(args.top, serverless=True),
+    }
+    for serverless in (False, True):
+        result = measure(args.runs, serverless)
+        print(
+            f"{'serverless' if serverless else 'serveur'} : import médian {result['import_seconds']['median']} s, "
+            f"première requête {result['first_request_seconds']['median']} s, "
+            f"client Bedrock {result['bedrock_client_seconds']['median']} s"
+        )
+        report["modes"].append(result)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nRésultats enregistrés dans '{args.output}'")
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Budget de jetons d'entrée des prompts
+Lorsqu'un prompt dépasse la limite de son profil, les champs longs (description
+de l'offre, expérience) sont réduits à leurs phrases les plus pertinentes au
+regard des compétences du candidat et des exigences du poste ; les passages
+génériques (avantages, mentions légales) sont écartés en priorité
+"""
+
+import os
+import threading
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from digests import estimate_tokens, select_relevant
+
+
+class BudgetReport(NamedTuple):
+    """
+    Effet du budget sur un prompt : jetons estimés avant et après réduction,
+    durée de l'étape
+    """
+    limit: Optional[int]
+    tokens_before: int
+    tokens_after: int
+    seconds: float
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+class TokenBudget:
+    """
+    Ramène l'entrée d'un prompt sous la limite de son profil en réduisant
+    ses champs longs, dans l'ordre donné, jusqu'à résorber le dépassement
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, min_field_tokens: Optional[int] = None):
+        self.enabled = enabled if enabled is not None else os.environ.get("LLM_TOKEN_BUDGET", "1") != "0"
+        self.min_field_tokens = min_field_tokens or int(os.environ.get("LLM_TOKEN_BUDGET_MIN_FIELD_TOKENS", "80"))
+        self._lock = threading.Lock()
+
+        # Compteurs exposés par stats()
+        self.checked = 0
+        self.trimmed = 0
+        self.over_budget = 0
+        self.tokens_saved = 0
+        self.seconds = 0.0
+
+    def fit(
+        self,
+        prompt_tokens: int,
+        limit: Optional[int],
+        fields: Dict[str, str],
+        keywords: Iterable[str],
+        sizes: Optional[Dict[str, int]] = None
+    ) -> Tuple[Dict[str, str], int]:
+        """
+        Réduit les champs de façon à retirer le dépassement de prompt_tokens
+        par rapport à limit. sizes donne la place qu'occupe chaque champ dans
+        le prompt (ex: après résumé), par défaut la taille du texte. Retourne
+        les champs modifiés et le nombre de jetons estimés retirés.
+        """
+        if not self.enabled or not limit or prompt_tokens <= limit:
+            return {}, 0
+        excess = prompt_tokens - limit
+        keywords = list(keywords)
+        changed: Dict[str, str] = {}
+        removed = 0
+        for name, text in fields.items():
+            if removed >= excess:
+                break
+            tokens = sizes[name] if sizes and name in sizes else estimate_tokens(text)
+            allowed = max(self.min_field_tokens, tokens - (excess - removed))
+            if allowed >= tokens:
+                continue
+            trimmed = select_relevant(text, keywords, allowed)
+            changed[name] = trimmed
+            removed += tokens - estimate_tokens(trimmed)
+        return changed, removed
+
+    def record(self, report: BudgetReport):
+        with self._lock:
+            self.checked += 1
+            self.seconds += report.seconds
+            if report.limit and report.tokens_before > report.limit:
+                self.over_budget += 1
+            if report.tokens_saved > 0:
+                self.trimmed += 1
+                self.tokens_saved += report.tokens_saved
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retourne les prompts vérifiés et réduits, les jetons retirés et le
+        temps passé dans l'étape
+        """
+        return {
+            "enabled": self.enabled,
+            "checked": self.checked,
+            "over_budget": self.over_budget,
+            "trimmed": self.trimmed,
+            "estimated_tokens_saved": self.tokens_saved,
+            "total_seconds": round(self.seconds, 4),
+        }
+
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Header, Response
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId  # ✅ Pour convertir user_id
@@ -7,33 +7,75 @@ from app.db.database import get_database
 from app.models.scraping import ScrapingSession
 from app.models.user import User
 from app.services.linkedin_scraper import LinkedInScraper
+from app.services.idempotency import IdempotencyConflict, idempotency_service
 
 router = APIRouter()
 
 @router.post("/start", response_model=ScrapingSession)
 async def start_scraping(
     session: ScrapingSession,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
     """
     Démarre une nouvelle session de scraping LinkedIn.
+    fetch_backend choisit la récupération des pages : "browser" (Chrome,
+    connexion LinkedIn) ou "http" (pages publiques, sans navigateur).
+    Avec un en-tête Idempotency-Key, une requête répétée retourne la session
+    déjà créée (dans son état actuel) au lieu d'en lancer une autre.
     """
+    if session.fetch_backend not in ("browser", "http"):
+        raise HTTPException(status_code=400, detail="fetch_backend doit valoir 'browser' ou 'http'")
+
     db = await get_database()
 
-    # ✅ Vérifier si l'utilisateur existe avec conversion ObjectId
+    key = None
+    if idempotency_key:
+        # Clé propre à l'utilisateur ; seuls les paramètres de recherche identifient la requête
+        key = f"scraping/start:{session.user_id}:{idempotency_key}"
+        request_payload = session.dict(include={"user_id", "search_query", "location", "filters", "fetch_backend"})
+        while True:
+            try:
+                first_request, existing_session_id = await idempotency_service.begin(key, request_payload)
+            except IdempotencyConflict as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            except TimeoutError as e:
+                raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "1"})
+            if first_request:
+                break
+
+            existing_session = await db.scraping_sessions.find_one({"_id": ObjectId(existing_session_id)})
+            if existing_session:
+                response.headers["Idempotent-Replayed"] = "true"
+                return existing_session
+            # Session supprimée entre-temps : la clé est libérée puis réservée à
+            # nouveau (ou le résultat d'une requête concurrente est rejoué)
+            await idempotency_service.release(key, existing_session_id)
+
     try:
-        user = await db.users.find_one({"_id": ObjectId(session.user_id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Format de user_id invalide")
+        # ✅ Vérifier si l'utilisateur existe avec conversion ObjectId
+        try:
+            user = await db.users.find_one({"_id": ObjectId(session.user_id)})
+        except Exception:
+            raise HTTPException(status_code=400, detail="Format de user_id invalide")
+
+        if not user:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        # Mettre à jour le statut de la session
+        session.status = "pending"
 
-    # Mettre à jour le statut de la session
-    session.status = "pending"
+        # Insérer la session
+        result = await db.scraping_sessions.insert_one(session.dict(by_alias=True))
+    except BaseException:
+        # Aucune session créée : la clé est libérée pour une nouvelle tentative
+        if key:
+            await idempotency_service.release(key)
+        raise
 
-    # Insérer la session
-    result = await db.scraping_sessions.insert_one(session.dict(by_alias=True))
+    if key:
+        await idempotency_service.complete(key, str(result.inserted_id))
 
     # Récupérer la session créée
     created_session = await db.scraping_sessions.find_one({"_id": result.inserted_id})
@@ -44,7 +86,8 @@ async def start_scraping(
         str(created_session["_id"]),
         session.search_query,
         session.location,
-        session.filters
+        session.filters,
+        session.fetch_backend
     )
 
     return created_session
@@ -87,7 +130,13 @@ async def get_scraping_session(session_id: str):
 
     return session
 
-async def run_scraping_task(session_id: str, search_query: str, location: Optional[str], filters: dict):
+async def run_scraping_task(
+    session_id: str,
+    search_query: str,
+    location: Optional[str],
+    filters: dict,
+    fetch_backend: str = "browser"
+):
     """
     Fonction exécutée en arrière-plan pour le scraping LinkedIn.
     """
@@ -100,15 +149,20 @@ async def run_scraping_task(session_id: str, search_query: str, location: Option
             {"$set": {"status": "running"}}
         )
 
-        scraper.login()
-
-        # Utilisation de la méthode search_jobs_custom qui utilise les fonctions de scrapping.py
-        jobs = scraper.search_jobs_custom(
+        search_args = dict(
             keywords=search_query.split() if search_query else None,
             locations=[location] if location else None,
             contract_types=[filters.get("job_type")] if filters.get("job_type") else None,
             max_pages=3
         )
+        if fetch_backend == "http":
+            # Pages publiques récupérées sans navigateur ni connexion
+            jobs = await scraper.search_jobs_http(**search_args)
+        else:
+            scraper.login()
+
+            # Utilisation de la méthode search_jobs_custom qui utilise les fonctions de scrapping.py
+            jobs = scraper.search_jobs_custom(**search_args)
 
         jobs_saved = 0
         for job in jobs:
@@ -142,7 +196,8 @@ async def run_scraping_task(session_id: str, search_query: str, location: Option
                     "status": "completed",
                     "end_time": datetime.utcnow(),
                     "jobs_found": len(jobs),
-                    "jobs_added": jobs_saved
+                    "jobs_added": jobs_saved,
+                    "wait_seconds": round(scraper.pacing.waited_seconds, 3)
                 }
             }
         )
@@ -154,7 +209,8 @@ async def run_scraping_task(session_id: str, search_query: str, location: Option
                 "$set": {
                     "status": "failed",
                     "end_time": datetime.utcnow(),
-                    "error": str(e)
+                    "error": str(e),
+                    "wait_seconds": round(scraper.pacing.waited_seconds, 3)
                 }
             }
         )
@@ -22,5 +22,30 @@ class Settings(BaseSettings):
     # LinkedIn
     LINKEDIN_USERNAME: str = os.getenv("LINKEDIN_USERNAME", "")
     LINKEDIN_PASSWORD: str = os.getenv("LINKEDIN_PASSWORD", "")
+    
+    # Récupération HTTP sans navigateur (pages publiques, sessions en mode "http")
+    LINKEDIN_BASE_URL: str = os.getenv("LINKEDIN_BASE_URL", "https://www.linkedin.com")
+    HTTP_FETCH_MAX_CONNECTIONS: int = int(os.getenv("HTTP_FETCH_MAX_CONNECTIONS", "10"))
+    HTTP_FETCH_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_FETCH_TIMEOUT_SECONDS", "15"))
+    
+    # Pool de navigateurs Chrome partagé par les sessions de scraping
+    SCRAPER_POOL_SIZE: int = int(os.getenv("SCRAPER_POOL_SIZE", "3"))
+    SCRAPER_DRIVER_MAX_USES: int = int(os.getenv("SCRAPER_DRIVER_MAX_USES", "25"))
+    SCRAPER_MAX_CONCURRENCY: int = int(os.getenv("SCRAPER_MAX_CONCURRENCY", os.getenv("SCRAPER_POOL_SIZE", "3")))
+    SCRAPER_POOL_WAIT_SECONDS: float = float(os.getenv("SCRAPER_POOL_WAIT_SECONDS", "120"))
+    
+    # Rythme des chargements : délai adaptatif borné et attente maximale d'une page
+    SCRAPER_MIN_DELAY_SECONDS: float = float(os.getenv("SCRAPER_MIN_DELAY_SECONDS", "0.2"))
+    SCRAPER_MAX_DELAY_SECONDS: float = float(os.getenv("SCRAPER_MAX_DELAY_SECONDS", "10"))
+    SCRAPER_PAGE_TIMEOUT_SECONDS: float = float(os.getenv("SCRAPER_PAGE_TIMEOUT_SECONDS", "10"))
+    
+    # Cache des détails d'offres : "local" (SQLite), "mongodb" ou "off"
+    JOB_DETAIL_CACHE: str = os.getenv("JOB_DETAIL_CACHE", "local")
+    JOB_DETAIL_CACHE_PATH: str = os.getenv("JOB_DETAIL_CACHE_PATH", "job_details_cache.db")
+    JOB_DETAIL_CACHE_TTL_SECONDS: int = int(os.getenv("JOB_DETAIL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    
+    # Idempotence (en-tête Idempotency-Key) : "memory" ou "mongodb"
+    IDEMPOTENCY_STORE: str = os.getenv("IDEMPOTENCY_STORE", "memory")
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
 
 settings = Settings()
\ No newline at end of file
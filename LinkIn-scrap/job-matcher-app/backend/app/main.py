@@ -7,6 +7,8 @@ from contextlib import asynccontextmanager
 from app.api.router import api_router
 from app.core.config import settings
 from app.db.init_db import init_mongodb
+from app.services.webdriver_pool import close_webdriver_pool
+from app.services.job_detail_cache import close_job_detail_store
 
 # Chargement des variables d'environnement
 load_dotenv()
@@ -18,8 +20,10 @@ async def lifespan(app: FastAPI):
     app.mongodb_client = await init_mongodb()
     app.mongodb = app.mongodb_client[settings.DB_NAME]
     yield
-    # Shutdown: close database connection
+    # Shutdown: close database connection and scraping browsers
     app.mongodb_client.close()
+    close_webdriver_pool()
+    close_job_detail_store()
 
 # Création de l'application FastAPI
 app = FastAPI(
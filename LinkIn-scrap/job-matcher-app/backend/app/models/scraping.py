@@ -9,11 +9,13 @@ class ScrapingSession(BaseModel):
     search_query: str
     location: Optional[str] = None
     filters: Dict = {}
+    fetch_backend: str = "browser"  # browser (Chrome), http (pages publiques sans navigateur)
     status: str = "pending"  # pending, running, completed, failed
     start_time: datetime = Field(default_factory=datetime.utcnow)
     end_time: Optional[datetime] = None
     jobs_found: int = 0
     jobs_added: int = 0
+    wait_seconds: float = 0.0  # Temps passé à attendre (délais entre pages et chargements)
     error: Optional[str] = None
     
     class Config:
@@ -0,0 +1,136 @@
+import re
+import time
+import asyncio
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+
+# Identifiant numérique d'une offre dans son URL (ex: /jobs/view/developpeur-python-3912345678?...)
+JOB_ID_PATTERN = re.compile(r"(\d{6,})(?:[/?#]|$)")
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36"
+
+
+def job_id_from_url(url: str) -> Optional[str]:
+    """
+    Extrait l'identifiant LinkedIn d'une offre depuis son URL.
+    """
+    match = JOB_ID_PATTERN.search(url.split("?")[0] + "?")
+    return match.group(1) if match else None
+
+
+class HttpJobFetcher:
+    """
+    Récupère les pages publiques des offres LinkedIn sans navigateur.
+
+    Les points d'accès invités (jobs-guest) renvoient le même HTML que les
+    pages rendues par Chrome pour les cartes de résultats et le détail d'une
+    offre, analysé ensuite par les mêmes fonctions. Un client HTTP asynchrone
+    garde ses connexions ouvertes (keep-alive) et charge les pages en parallèle.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        timeout: Optional[float] = None,
+        pacing=None
+    ):
+        self.base_url = (base_url or settings.LINKEDIN_BASE_URL).rstrip("/")
+        self.max_connections = max_connections or settings.HTTP_FETCH_MAX_CONNECTIONS
+        self.timeout = timeout or settings.HTTP_FETCH_TIMEOUT_SECONDS
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        # PacingController de la session (délai adaptatif entre requêtes), facultatif
+        self.pacing = pacing
+
+        # Compteurs exposés par stats()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_received = 0
+        self.seconds = 0.0
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT, "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8"},
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            timeout=self.timeout,
+            follow_redirects=True
+        )
+        # Une requête par connexion à la fois : le délai de rythme s'applique entre ses requêtes
+        self._slots = asyncio.Semaphore(self.max_connections)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+
+    def search_url(self, search_params: str, start: int) -> str:
+        """
+        URL d'une page de résultats (25 offres) à partir des paramètres de recherche.
+        """
+        return f"{self.base_url}/jobs-guest/jobs/api/seeMoreJobPostings/search?{search_params}&start={start}"
+
+    def detail_url(self, job_url: str) -> str:
+        """
+        URL du détail d'une offre ; l'URL d'origine est gardée si l'identifiant est introuvable.
+        """
+        job_id = job_id_from_url(job_url)
+        if not job_id:
+            return job_url
+        return f"{self.base_url}/jobs-guest/jobs/api/jobPosting/{job_id}"
+
+    async def fetch(self, url: str) -> str:
+        """
+        Retourne le HTML de la page, ou une chaîne vide en cas d'erreur.
+        """
+        async with self._slots:
+            if self.pacing:
+                await self.pacing.wait_async()
+            return await self._get(url)
+
+    async def _get(self, url: str) -> str:
+        started = time.perf_counter()
+        self.requests += 1
+        ok = False
+        try:
+            response = await self._client.get(url)
+            # 999 : réponse de LinkedIn à une cadence jugée excessive
+            if response.status_code == 999:
+                raise httpx.HTTPStatusError("Requête bloquée (999)", request=response.request, response=response)
+            response.raise_for_status()
+            self.bytes_received += len(response.content)
+            ok = True
+            return response.text
+        except httpx.HTTPError as e:
+            self.errors += 1
+            print(f"Erreur lors de la récupération de {url} : {e}")
+            return ""
+        finally:
+            elapsed = time.perf_counter() - started
+            self.seconds += elapsed
+            if self.pacing:
+                self.pacing.record(elapsed, ok=ok)
+
+    async def fetch_many(self, urls: List[str]) -> List[str]:
+        """
+        Charge les pages en parallèle (bornées par le pool de connexions) et
+        retourne leur HTML dans l'ordre des URLs.
+        """
+        return list(await asyncio.gather(*(self.fetch(url) for url in urls)))
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Retourne le nombre de pages chargées, les erreurs, le volume reçu et la durée cumulée.
+        """
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "bytes_received": self.bytes_received,
+            "total_seconds": round(self.seconds, 3)
+        }
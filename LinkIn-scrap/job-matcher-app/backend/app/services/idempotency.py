@@ -0,0 +1,180 @@
+import time
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+class IdempotencyConflict(Exception):
+    """
+    Clé d'idempotence déjà utilisée pour une requête différente.
+    """
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """
+    Empreinte du corps de la requête associée à une clé.
+    """
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class MemoryIdempotencyStore:
+    """
+    Clés d'idempotence conservées en mémoire (une seule instance de l'API).
+    """
+
+    def __init__(self):
+        self._records: Dict[str, Dict[str, Any]] = {}
+
+    async def claim(self, key: str, fingerprint: str, ttl_seconds: int) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Réserve la clé. Retourne (True, nouvel enregistrement) si elle était
+        libre, sinon (False, enregistrement existant).
+        """
+        now = time.time()
+        # Purge des clés expirées
+        for expired in [k for k, record in self._records.items() if record["expires_at"] <= now]:
+            del self._records[expired]
+
+        existing = self._records.get(key)
+        if existing is not None:
+            return False, dict(existing)
+        record = {"fingerprint": fingerprint, "result": None, "expires_at": now + ttl_seconds}
+        self._records[key] = record
+        return True, dict(record)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        record = self._records.get(key)
+        if record is None or record["expires_at"] <= time.time():
+            return None
+        return dict(record)
+
+    async def complete(self, key: str, result: Any):
+        if key in self._records:
+            self._records[key]["result"] = result
+
+    async def release(self, key: str, result: Any = None):
+        record = self._records.get(key)
+        if record is not None and (result is None or record["result"] == result):
+            del self._records[key]
+
+
+class MongoIdempotencyStore:
+    """
+    Clés d'idempotence conservées dans MongoDB, partagées entre instances.
+    Un index TTL supprime les clés expirées.
+    """
+
+    def __init__(self, collection: str = "idempotency_keys"):
+        self.collection_name = collection
+        self._collection = None
+
+    async def _get_collection(self):
+        if self._collection is None:
+            from app.db.database import get_database
+
+            db = await get_database()
+            self._collection = db[self.collection_name]
+            await self._collection.create_index("expires_at", expireAfterSeconds=0)
+        return self._collection
+
+    async def claim(self, key: str, fingerprint: str, ttl_seconds: int) -> Tuple[bool, Dict[str, Any]]:
+        from pymongo.errors import DuplicateKeyError
+
+        collection = await self._get_collection()
+        record = {
+            "fingerprint": fingerprint,
+            "result": None,
+            "expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        }
+        try:
+            await collection.insert_one(dict(record, _id=key))
+            return True, record
+        except DuplicateKeyError:
+            existing = await self.get(key)
+            if existing is not None:
+                return False, existing
+            # Clé expirée pas encore purgée par l'index TTL : elle est reprise
+            await collection.replace_one({"_id": key}, record, upsert=True)
+            return True, record
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        collection = await self._get_collection()
+        record = await collection.find_one({"_id": key}, {"_id": 0})
+        if record is None or record["expires_at"] <= datetime.utcnow():
+            return None
+        return record
+
+    async def complete(self, key: str, result: Any):
+        collection = await self._get_collection()
+        await collection.update_one({"_id": key}, {"$set": {"result": result}})
+
+    async def release(self, key: str, result: Any = None):
+        collection = await self._get_collection()
+        query = {"_id": key}
+        if result is not None:
+            query["result"] = result
+        await collection.delete_one(query)
+
+
+class IdempotencyService:
+    """
+    Associe une clé d'idempotence au résultat d'une requête (ex: l'identifiant
+    de la session de scraping créée), pour qu'une requête répétée pendant la
+    durée de validité retourne ce résultat au lieu de refaire le travail.
+    """
+
+    def __init__(self, store=None, ttl_seconds: Optional[int] = None, wait_seconds: float = 30):
+        self.store = store if store is not None else create_idempotency_store()
+        self.ttl_seconds = ttl_seconds or settings.IDEMPOTENCY_TTL_SECONDS
+        self.wait_seconds = wait_seconds
+
+    async def begin(self, key: str, payload: Dict[str, Any]) -> Tuple[bool, Any]:
+        """
+        Retourne (True, None) si la requête doit être traitée, ou (False,
+        résultat) si la clé a déjà produit un résultat. Une requête d'origine
+        encore en cours est attendue jusqu'à wait_seconds.
+        """
+        fingerprint = request_fingerprint(payload)
+        started = time.monotonic()
+        while True:
+            claimed, record = await self.store.claim(key, fingerprint, self.ttl_seconds)
+            if claimed:
+                return True, None
+            if record["fingerprint"] != fingerprint:
+                raise IdempotencyConflict("Clé d'idempotence déjà utilisée pour une requête différente")
+            if record["result"] is not None:
+                return False, record["result"]
+            if time.monotonic() - started > self.wait_seconds:
+                raise TimeoutError("Requête d'origine toujours en cours, réessayez plus tard")
+            # Requête d'origine en cours : attente de son résultat (ou de son échec, qui libère la clé)
+            await asyncio.sleep(0.2)
+
+    async def complete(self, key: str, result: Any):
+        """
+        Enregistre le résultat de la requête d'origine.
+        """
+        await self.store.complete(key, result)
+
+    async def release(self, key: str, result: Any = None):
+        """
+        Libère la clé après un échec pour permettre une nouvelle tentative.
+        Avec result, la clé n'est libérée que si elle porte encore ce résultat
+        (elle a pu être reprise entre-temps par une autre requête).
+        """
+        await self.store.release(key, result)
+
+
+def create_idempotency_store():
+    """
+    Crée le stockage des clés selon IDEMPOTENCY_STORE ("memory" ou "mongodb").
+    """
+    if settings.IDEMPOTENCY_STORE == "mongodb":
+        return MongoIdempotencyStore()
+    return MemoryIdempotencyStore()
+
+
+idempotency_service = IdempotencyService()
@@ -0,0 +1,220 @@
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.http_fetcher import job_id_from_url
+
+# Détails d'une offre : (description, recruteur, email)
+OfferDetails = Tuple[str, str, str]
+
+
+class LocalJobDetailStore:
+    """
+    Détails des offres conservés dans un fichier SQLite local.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_details (job_id TEXT PRIMARY KEY, details TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, job_ids: List[str]) -> Dict[str, OfferDetails]:
+        if not job_ids:
+            return {}
+        placeholders = ",".join("?" * len(job_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT job_id, details FROM job_details WHERE fetched_at > ? AND job_id IN ({placeholders})",
+                [time.time() - self.ttl_seconds, *job_ids]
+            ).fetchall()
+        return {job_id: tuple(json.loads(details)) for job_id, details in rows}
+
+    def put_many(self, details: Dict[str, OfferDetails]):
+        if not details:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO job_details (job_id, details, fetched_at) VALUES (?, ?, ?)",
+                [(job_id, json.dumps(list(value), ensure_ascii=False), now) for job_id, value in details.items()]
+            )
+            # Purge des détails périmés
+            self._conn.execute("DELETE FROM job_details WHERE fetched_at <= ?", (now - self.ttl_seconds,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MongoJobDetailStore:
+    """
+    Détails des offres conservés dans MongoDB (partagés entre instances).
+    Un index TTL supprime les détails périmés.
+    """
+
+    def __init__(self, ttl_seconds: int, collection: str = "job_details_cache"):
+        from pymongo import MongoClient
+        from app.db.database import MONGODB_URI, DB_NAME
+
+        self.ttl_seconds = ttl_seconds
+        self._client = MongoClient(MONGODB_URI)
+        self._collection = self._client[DB_NAME][collection]
+        self._collection.create_index("fetched_at", expireAfterSeconds=ttl_seconds)
+
+    def get_many(self, job_ids: List[str]) -> Dict[str, OfferDetails]:
+        if not job_ids:
+            return {}
+        fresh_after = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        documents = self._collection.find({"_id": {"$in": job_ids}, "fetched_at": {"$gt": fresh_after}})
+        return {
+            document["_id"]: (document["description"], document["recruiter"], document["email"])
+            for document in documents
+        }
+
+    def put_many(self, details: Dict[str, OfferDetails]):
+        from pymongo import ReplaceOne
+
+        if not details:
+            return
+        now = datetime.utcnow()
+        self._collection.bulk_write([
+            ReplaceOne(
+                {"_id": job_id},
+                {"description": description, "recruiter": recruiter, "email": email, "fetched_at": now},
+                upsert=True
+            )
+            for job_id, (description, recruiter, email) in details.items()
+        ])
+
+    def close(self):
+        self._client.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_detail_store():
+    """
+    Retourne le stockage persistant des détails selon JOB_DETAIL_CACHE
+    ("local", "mongodb" ou "off"), créé au premier appel.
+    """
+    global _store
+    with _store_lock:
+        if _store is None and settings.JOB_DETAIL_CACHE != "off":
+            if settings.JOB_DETAIL_CACHE == "mongodb":
+                _store = MongoJobDetailStore(settings.JOB_DETAIL_CACHE_TTL_SECONDS)
+            else:
+                _store = LocalJobDetailStore(settings.JOB_DETAIL_CACHE_PATH, settings.JOB_DETAIL_CACHE_TTL_SECONDS)
+        return _store
+
+
+def close_job_detail_store():
+    """
+    Ferme le stockage des détails (arrêt de l'application).
+    """
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
+
+class JobDetailCache:
+    """
+    Détails des offres d'une session de scraping, indexés par identifiant
+    LinkedIn. Une offre déjà vue dans la session est servie par la mémoire
+    de la session, une offre récente par le stockage persistant ; seules les
+    offres inconnues ou périmées sont chargées.
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else get_job_detail_store()
+        self._memo: Dict[str, OfferDetails] = {}
+
+        # Compteurs exposés par stats()
+        self.session_hits = 0
+        self.store_hits = 0
+        self.fetched = 0
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return job_id_from_url(url) or url
+
+    def _missing(self, urls: List[str]) -> List[str]:
+        """
+        URLs (une par offre) absentes de la session et du stockage persistant.
+        """
+        keys: Dict[str, str] = {}
+        for url in urls:
+            key = self._key(url)
+            if key in self._memo:
+                self.session_hits += 1
+            elif key not in keys:
+                keys[key] = url
+        if keys and self.store is not None:
+            stored = self.store.get_many(list(keys))
+            self.store_hits += len(stored)
+            self._memo.update(stored)
+            for key in stored:
+                del keys[key]
+        return list(keys.values())
+
+    def _absorb(self, urls: List[str], details: List[OfferDetails]):
+        """
+        Mémorise les détails chargés ; seuls les chargements réussis sont conservés durablement.
+        """
+        self.fetched += len(urls)
+        loaded = {}
+        for url, value in zip(urls, details):
+            key = self._key(url)
+            self._memo[key] = value
+            if value[0] != "N/A":
+                loaded[key] = value
+        if loaded and self.store is not None:
+            self.store.put_many(loaded)
+
+    def resolve(self, urls: List[str], fetch: Callable[[List[str]], List[OfferDetails]]) -> List[OfferDetails]:
+        """
+        Retourne les détails des offres dans l'ordre des URLs ; fetch(urls)
+        charge celles qui manquent.
+        """
+        missing = self._missing(urls)
+        if missing:
+            self._absorb(missing, fetch(missing))
+        return [self._memo[self._key(url)] for url in urls]
+
+    async def resolve_async(
+        self,
+        urls: List[str],
+        fetch: Callable[[List[str]], Awaitable[List[OfferDetails]]]
+    ) -> List[OfferDetails]:
+        """
+        Variante de resolve pour un chargement asynchrone (mode http) ; les
+        accès au stockage se font hors de la boucle d'événements.
+        """
+        missing = await asyncio.to_thread(self._missing, urls)
+        if missing:
+            details = await fetch(missing)
+            await asyncio.to_thread(self._absorb, missing, details)
+        return [self._memo[self._key(url)] for url in urls]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retourne les détails servis par la session, par le stockage et ceux chargés.
+        """
+        return {
+            "session_hits": self.session_hits,
+            "store_hits": self.store_hits,
+            "fetched": self.fetched
+        }
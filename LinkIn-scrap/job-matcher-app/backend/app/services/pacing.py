@@ -0,0 +1,156 @@
+import time
+import asyncio
+import threading
+from typing import Dict, Optional, Tuple
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+
+from app.core.config import settings
+
+
+class PacingController:
+    """
+    Délai adaptatif entre deux chargements de page d'une session de scraping.
+
+    Le délai suit le temps de réponse observé (un site lent est sollicité
+    moins souvent), double après une erreur ou un blocage, puis redescend
+    progressivement tant que les réponses sont correctes. Il reste toujours
+    entre min_delay et max_delay (bornes de politesse). Les départs sont
+    espacés du délai courant pour toute la session, quel que soit le nombre
+    de threads ou de requêtes simultanées. Le temps passé à attendre, délais
+    et attentes de chargement compris, est cumulé pour la session.
+    """
+
+    def __init__(
+        self,
+        min_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        latency_factor: float = 1.0,
+        decay: float = 0.9
+    ):
+        self.min_delay = min_delay if min_delay is not None else settings.SCRAPER_MIN_DELAY_SECONDS
+        self.max_delay = max(self.min_delay, max_delay if max_delay is not None else settings.SCRAPER_MAX_DELAY_SECONDS)
+        self.latency_factor = latency_factor
+        self.decay = decay
+        self.delay = self.min_delay
+        self._latency: Optional[float] = None
+        self._error_rate = 0.0
+        # Prochain départ autorisé (horloge monotone), partagé par tous les appelants
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+        # Compteurs exposés par stats()
+        self.requests = 0
+        self.errors = 0
+        self.paced_seconds = 0.0
+        self.load_wait_seconds = 0.0
+
+    def _reserve(self) -> float:
+        """
+        Réserve le prochain créneau de départ et retourne l'attente jusqu'à celui-ci.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.delay
+            self.paced_seconds += start - now
+        return start - now
+
+    def wait(self):
+        """
+        Attend son créneau avant un chargement (threads du pool de navigateurs).
+        """
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self):
+        """
+        Attend son créneau avant une requête HTTP.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record(self, seconds: float, ok: bool = True):
+        """
+        Prend en compte la durée d'un chargement et son issue pour ajuster le délai.
+        """
+        with self._lock:
+            self.requests += 1
+            self._latency = seconds if self._latency is None else 0.8 * self._latency + 0.2 * seconds
+            self._error_rate = 0.8 * self._error_rate + (0.0 if ok else 0.2)
+            if not ok:
+                self.errors += 1
+                delay = max(self.delay * 2, self.min_delay * 2)
+            else:
+                target = self._latency * self.latency_factor
+                delay = max(target, self.delay * self.decay)
+            self.delay = min(self.max_delay, max(self.min_delay, delay))
+
+    def add_load_wait(self, seconds: float):
+        """
+        Ajoute le temps passé à attendre le chargement d'une page.
+        """
+        with self._lock:
+            self.load_wait_seconds += seconds
+
+    @property
+    def waited_seconds(self) -> float:
+        return self.paced_seconds + self.load_wait_seconds
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Retourne le délai courant, le taux d'erreur récent et le temps d'attente cumulé.
+        """
+        return {
+            "delay": round(self.delay, 3),
+            "latency": round(self._latency, 3) if self._latency is not None else None,
+            "error_rate": round(self._error_rate, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "paced_seconds": round(self.paced_seconds, 3),
+            "load_wait_seconds": round(self.load_wait_seconds, 3)
+        }
+
+
+def wait_for_stable_count(
+    driver,
+    css_selector: str,
+    timeout: Optional[float] = None,
+    min_count: int = 1,
+    poll_interval: float = 0.25,
+    stable_polls: int = 2
+) -> Tuple[int, float]:
+    """
+    Attend que le nombre d'éléments correspondant à css_selector atteigne
+    min_count puis cesse d'augmenter (inchangé pendant stable_polls relevés),
+    au lieu d'une pause fixe. Retourne (nombre d'éléments, secondes attendues) ;
+    à l'échéance, retourne le nombre atteint.
+    """
+    timeout = timeout if timeout is not None else settings.SCRAPER_PAGE_TIMEOUT_SECONDS
+    started = time.perf_counter()
+    deadline = started + timeout
+    # Pas d'attente implicite pendant les relevés : find_elements doit répondre immédiatement
+    driver.implicitly_wait(0)
+    try:
+        count, unchanged = -1, 0
+        while True:
+            try:
+                current = len(driver.find_elements(By.CSS_SELECTOR, css_selector))
+            except WebDriverException:
+                current = 0
+            if current == count and current >= min_count:
+                unchanged += 1
+                if unchanged >= stable_polls:
+                    break
+            else:
+                unchanged = 0
+            count = current
+            if time.perf_counter() >= deadline:
+                break
+            time.sleep(poll_interval)
+    finally:
+        driver.implicitly_wait(10)
+    return max(count, 0), time.perf_counter() - started
@@ -0,0 +1,237 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+
+from app.core.config import settings
+
+
+def create_chrome_driver():
+    """
+    Crée un navigateur Chrome headless configuré pour LinkedIn.
+    """
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")  # Exécution sans interface graphique
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36")
+
+    driver = webdriver.Chrome(options=chrome_options)
+    driver.implicitly_wait(10)
+    return driver
+
+
+class PooledDriver:
+    """
+    Navigateur du pool avec son nombre d'utilisations.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.cookies_version = 0
+
+
+class WebDriverPool:
+    """
+    Pool de navigateurs Chrome partagé entre les sessions de scraping.
+
+    Au plus `size` navigateurs sont ouverts (créés à la demande) et au plus
+    `max_concurrency` pages sont chargées en même temps. Un navigateur est
+    vérifié avant chaque emprunt (remplacé s'il ne répond plus) et recyclé
+    après `max_uses` pages pour limiter la mémoire consommée par Chrome.
+    Un emprunt attend au plus `wait_timeout` secondes qu'un navigateur se libère.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_uses: int,
+        max_concurrency: Optional[int] = None,
+        factory: Callable[[], object] = create_chrome_driver,
+        wait_timeout: Optional[float] = None
+    ):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.max_concurrency = max(1, max_concurrency or self.size)
+        self.factory = factory
+        self.wait_timeout = wait_timeout if wait_timeout is not None else settings.SCRAPER_POOL_WAIT_SECONDS
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._available = threading.Condition()
+        self._idle: List[PooledDriver] = []
+        self._alive = 0
+        self._closed = False
+
+        # Cookies de la session LinkedIn, copiés dans chaque navigateur
+        self._cookies: List[Dict] = []
+        self._cookies_version = 0
+
+        # Compteurs exposés par stats()
+        self.created = 0
+        self.recycled = 0
+        self.unhealthy = 0
+        self.checkouts = 0
+
+    def set_cookies(self, cookies: List[Dict]):
+        """
+        Enregistre les cookies de connexion à appliquer aux navigateurs du pool.
+        """
+        with self._available:
+            self._cookies = list(cookies)
+            self._cookies_version += 1
+
+    @contextmanager
+    def driver(self) -> Iterator[object]:
+        """
+        Emprunte un navigateur pour la durée du bloc.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise self._timeout()
+        try:
+            pooled = self._acquire(deadline)
+            try:
+                yield pooled.driver
+            finally:
+                self._release(pooled)
+        finally:
+            self._slots.release()
+
+    def _timeout(self) -> TimeoutError:
+        return TimeoutError(f"Aucun navigateur disponible après {self.wait_timeout:g} secondes")
+
+    def _acquire(self, deadline: float) -> PooledDriver:
+        while True:
+            with self._available:
+                while not self._idle and self._alive >= self.size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._timeout()
+                    self._available.wait(remaining)
+                if self._closed:
+                    raise RuntimeError("Le pool de navigateurs est fermé")
+                pooled = self._idle.pop() if self._idle else None
+                if pooled is None:
+                    self._alive += 1
+
+            if pooled is None:
+                try:
+                    pooled = PooledDriver(self.factory())
+                except Exception:
+                    with self._available:
+                        self._alive -= 1
+                        self._available.notify()
+                    raise
+                self.created += 1
+            elif not self._is_healthy(pooled):
+                self.unhealthy += 1
+                self._discard(pooled)
+                continue
+
+            try:
+                self._apply_cookies(pooled)
+            except Exception:
+                # Navigateur dans un état inconnu : fermé pour libérer sa place dans le pool
+                self._discard(pooled)
+                raise
+            self.checkouts += 1
+            return pooled
+
+    def _release(self, pooled: PooledDriver):
+        pooled.uses += 1
+        if self._closed or pooled.uses >= self.max_uses:
+            if not self._closed:
+                self.recycled += 1
+            self._discard(pooled)
+            return
+        with self._available:
+            self._idle.append(pooled)
+            self._available.notify()
+
+    def _discard(self, pooled: PooledDriver):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+        with self._available:
+            self._alive -= 1
+            self._available.notify()
+
+    @staticmethod
+    def _is_healthy(pooled: PooledDriver) -> bool:
+        try:
+            pooled.driver.execute_script("return 1")
+            return True
+        except WebDriverException:
+            return False
+
+    def _apply_cookies(self, pooled: PooledDriver):
+        version, cookies = self._cookies_version, self._cookies
+        if pooled.cookies_version == version or not cookies:
+            return
+        # Les cookies ne peuvent être ajoutés que sur le domaine concerné
+        pooled.driver.get("https://www.linkedin.com")
+        for cookie in cookies:
+            try:
+                pooled.driver.add_cookie(cookie)
+            except WebDriverException:
+                continue
+        pooled.cookies_version = version
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retourne les navigateurs ouverts, créés, recyclés et remplacés.
+        """
+        return {
+            "alive": self._alive,
+            "idle": len(self._idle),
+            "created": self.created,
+            "recycled": self.recycled,
+            "unhealthy": self.unhealthy,
+            "checkouts": self.checkouts
+        }
+
+    def close(self):
+        """
+        Ferme tous les navigateurs ; ceux en cours d'utilisation sont fermés à leur retour.
+        """
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for pooled in idle:
+            self._discard(pooled)
+
+
+_pool: Optional[WebDriverPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_webdriver_pool() -> WebDriverPool:
+    """
+    Retourne le pool de navigateurs de l'application (créé au premier appel).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = WebDriverPool(
+                size=settings.SCRAPER_POOL_SIZE,
+                max_uses=settings.SCRAPER_DRIVER_MAX_USES,
+                max_concurrency=settings.SCRAPER_MAX_CONCURRENCY
+            )
+        return _pool
+
+
+def close_webdriver_pool():
+    """
+    Ferme le pool de navigateurs (arrêt de l'application).
+    """
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
@@ -1,5 +1,8 @@
+import os
 import time
+import asyncio
 import traceback
+import httpx
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
@@ -12,6 +15,12 @@ from datetime import datetime
 
 # Configuration initiale
 BASE_URL = "https://www.linkedin.com/jobs/search/?keywords=developpeur%20python&location=Paris%2C%20France"
+# Racine des pages publiques pour le mode http (modifiable pour un serveur de test local)
+LINKEDIN_BASE_URL = os.getenv("LINKEDIN_BASE_URL", "https://www.linkedin.com").rstrip("/")
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36",
+    "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8"
+}
 
 def get_driver():
     options = Options()
@@ -29,36 +38,93 @@ def fetch_job_page_selenium(driver, url):
     time.sleep(2)  # Réduit pour accélérer
     return driver.page_source
 
+async def fetch_pages_http(urls, max_connections=10):
+    """
+    Télécharge les pages publiques en parallèle avec un client HTTP asynchrone
+    (connexions réutilisées), sans navigateur. Retourne le HTML dans l'ordre des URLs.
+    """
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    async with httpx.AsyncClient(headers=HTTP_HEADERS, limits=limits, timeout=15, follow_redirects=True) as client:
+        async def fetch(url):
+            try:
+                response = await client.get(url)
+                response.raise_for_status()
+                return response.text
+            except httpx.HTTPError as e:
+                print(f"Erreur lors de la récupération de {url} : {e}")
+                return ""
+        return await asyncio.gather(*(fetch(url) for url in urls))
+
+def guest_search_url(search_url, start):
+    # Point d'accès public des pages de résultats (mêmes cartes "base-card")
+    params = search_url.split("?", 1)[1]
+    return f"{LINKEDIN_BASE_URL}/jobs-guest/jobs/api/seeMoreJobPostings/search?{params}&start={start}"
+
+def offer_id(lien):
+    # Identifiant LinkedIn de l'offre (à défaut, le lien lui-même)
+    match = re.search(r"(\d{6,})(?:[/?#]|$)", lien.split("?")[0] + "?")
+    return match.group(1) if match else lien
+
+def guest_detail_url(lien):
+    # Point d'accès public du détail d'une offre, à partir de son identifiant
+    identifiant = offer_id(lien)
+    return f"{LINKEDIN_BASE_URL}/jobs-guest/jobs/api/jobPosting/{identifiant}" if identifiant != lien else lien
+
+def fetch_offers_details(driver, liens, details_connus):
+    """
+    Détails des offres : navigateur une par une, ou requêtes HTTP parallèles sans navigateur.
+    Seules les offres absentes de details_connus (identifiant -> détails) sont chargées.
+    """
+    manquants = list({offer_id(lien): lien for lien in liens if offer_id(lien) not in details_connus}.values())
+    if manquants:
+        if driver is None:
+            pages = asyncio.run(fetch_pages_http([guest_detail_url(lien) for lien in manquants]))
+            details = [parse_offer_details(html) for html in pages]
+        else:
+            details = [fetch_offer_details_selenium(driver, lien) for lien in manquants]
+        details_connus.update(zip((offer_id(lien) for lien in manquants), details))
+    return [details_connus[offer_id(lien)] for lien in liens]
+
 def main():
-    driver = get_driver()
     print("Vous pouvez laisser un champ vide si vous ne souhaitez pas filtrer dessus.")
     mots_cles_input = input("Entrez les mots-clés à filtrer (séparés par des virgules) : ")
     lieux_input = input("Entrez les lieux souhaités (séparés par des virgules) : ")
     type_contrat_input = input("Entrez les types de contrat à filtrer (CDI, CDD, Stage, etc. séparés par des virgules) : ")
+    mode_input = input("Mode de récupération : selenium (par défaut) ou http (pages publiques, sans navigateur) : ")
+    # En mode http, aucun navigateur n'est lancé
+    driver = None if mode_input.strip().lower() == "http" else get_driver()
 
     mots_cles_filtre = [mot.strip() for mot in mots_cles_input.split(",") if mot.strip()] if mots_cles_input.strip() else None
     lieux_filtre = [lieu.strip() for lieu in lieux_input.split(",") if lieu.strip()] if lieux_input.strip() else None
     types_contrat = [tc.strip().lower() for tc in type_contrat_input.split(",") if tc.strip()] if type_contrat_input.strip() else None
 
     all_offres_brutes = []
-    for page in range(0, 3):
-        start = page * 25
-        url = build_linkedin_url(
-            keywords=mots_cles_filtre,
-            location=lieux_filtre,
-            contract_types=types_contrat
-        ) + f"&start={start}"
-        print(f"Scraping page {page+1} : {url}")
-        html_content = fetch_job_page_selenium(driver, url)
-        offres_brutes = parse_job_offers(html_content)
-        all_offres_brutes.extend(offres_brutes)
-        time.sleep(1)
+    search_url = build_linkedin_url(
+        keywords=mots_cles_filtre,
+        location=lieux_filtre,
+        contract_types=types_contrat
+    )
+    if driver is None:
+        print("Scraping des pages 1 à 3 (http)")
+        pages = asyncio.run(fetch_pages_http([guest_search_url(search_url, page * 25) for page in range(0, 3)]))
+        for html_content in pages:
+            all_offres_brutes.extend(parse_job_offers(html_content))
+    else:
+        for page in range(0, 3):
+            start = page * 25
+            url = search_url + f"&start={start}"
+            print(f"Scraping page {page+1} : {url}")
+            html_content = fetch_job_page_selenium(driver, url)
+            offres_brutes = parse_job_offers(html_content)
+            all_offres_brutes.extend(offres_brutes)
+            time.sleep(1)
 
     print(f"{len(all_offres_brutes)} offres trouvées avant filtrage.")
 
     if not all_offres_brutes:
         print("Aucune offre n'a pu être extraite. Vérifiez les sélecteurs CSS et la structure de la page LinkedIn.")
-        driver.quit()
+        if driver:
+            driver.quit()
         return
 
     offres_filtrees = filter_offers(
@@ -67,10 +133,13 @@ def main():
         lieux_souhaites=lieux_filtre
     )
 
+    # Détails déjà chargés, par identifiant d'offre : chaque offre n'est chargée qu'une fois
+    details_connus = {}
+
     if types_contrat:
         nouvelles_offres = []
-        for offre in offres_filtrees:
-            description, _, _ = fetch_offer_details_selenium(driver, offre['lien'])
+        details = fetch_offers_details(driver, [offre['lien'] for offre in offres_filtrees], details_connus)
+        for offre, (description, _, _) in zip(offres_filtrees, details):
             if any(tc in offre["titre"].lower() or tc in description.lower() for tc in types_contrat):
                 nouvelles_offres.append(offre)
         offres_filtrees = nouvelles_offres
@@ -79,8 +148,8 @@ def main():
 
     # Construction du format MongoDB et export JSON
     offres_json = []
-    for i, offre in enumerate(offres_filtrees[:10]):
-        description, recruiter, email = fetch_offer_details_selenium(driver, offre['lien'])
+    details = fetch_offers_details(driver, [offre['lien'] for offre in offres_filtrees[:10]], details_connus)
+    for i, (offre, (description, recruiter, email)) in enumerate(zip(offres_filtrees[:10], details)):
         offre_json = {
             "title": offre['titre'],
             "company": offre['entreprise'],
@@ -112,13 +181,13 @@ def main():
         offres_json.append(offre_json)
         print(f"\n--- Offre {i+1} ---")
         print(json.dumps(offre_json, ensure_ascii=False, indent=2))
-        time.sleep(1)
 
     # Export JSON
     with open("resultat_offres.json", "w", encoding="utf-8") as f:
         json.dump(offres_json, f, ensure_ascii=False, indent=2)
 
-    driver.quit()
+    if driver:
+        driver.quit()
 
 def parse_job_offers(html_content):
     soup = BeautifulSoup(html_content, "html.parser")
@@ -164,22 +233,25 @@ def fetch_offer_details_selenium(driver, url):
     try:
         driver.get(url)
         time.sleep(1)  # Réduit pour accélérer
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        desc_tag = soup.find("div", class_="show-more-less-html__markup")
-        description = desc_tag.get_text(strip=True) if desc_tag else "N/A"
-        recruiter_tag = soup.find("a", class_="topcard__org-name-link") or soup.find("span", class_="topcard__flavor")
-        recruiter = recruiter_tag.get_text(strip=True) if recruiter_tag else "N/A"
-        email = "N/A"
-        if description and description != "N/A":
-            match = re.search(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+", description)
-            if match:
-                email = match.group(0)
-        return description, recruiter, email
+        return parse_offer_details(driver.page_source)
     except Exception as e:
         print(f"Erreur lors de la récupération des détails de l'offre : {e}")
         traceback.print_exc()
         return "N/A", "N/A", "N/A"
 
+def parse_offer_details(html_content):
+    soup = BeautifulSoup(html_content, "html.parser")
+    desc_tag = soup.find("div", class_="show-more-less-html__markup")
+    description = desc_tag.get_text(strip=True) if desc_tag else "N/A"
+    recruiter_tag = soup.find("a", class_="topcard__org-name-link") or soup.find("span", class_="topcard__flavor")
+    recruiter = recruiter_tag.get_text(strip=True) if recruiter_tag else "N/A"
+    email = "N/A"
+    if description and description != "N/A":
+        match = re.search(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+", description)
+        if match:
+            email = match.group(0)
+    return description, recruiter, email
+
 def build_linkedin_url(keywords=None, location=None, contract_types=None):
     base = "https://www.linkedin.com/jobs/search/?"
     params = []